@@ -0,0 +1,218 @@
+import json
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, request, \
+    stream_with_context
+
+from models import Artist, Show, Venue, db
+from queries import KeysetListing
+from routing import read_replica
+
+try:
+    import orjson
+except ImportError:  # The standard library encoder is used instead.
+    orjson = None
+
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+# ----------------------------------------------------------------------------#
+# JSON encoding.
+# ----------------------------------------------------------------------------#
+
+def encode_default(value):
+    # Datetimes, the only values json cannot encode, as ISO 8601 strings.
+    return value.isoformat()
+
+
+def dumps(data):
+    # Encodes to UTF-8 JSON bytes, with orjson when it is installed.
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=encode_default,
+                      separators=(',', ':')).encode()
+
+
+def json_response(data, status=200):
+    return current_app.response_class(dumps(data), status=status,
+                                      mimetype='application/json')
+
+
+# ----------------------------------------------------------------------------#
+# Resources.
+# ----------------------------------------------------------------------------#
+
+class Resource:
+    """
+        A collection served by the API: the fields clients may select, each
+        mapped to a column, and the unique columns rows are ordered and
+        paginated by. Only the selected fields, plus the sort key, are read.
+    """
+
+    def __init__(self, model, fields, key_columns, cursor_types,
+                 default_fields, joins=()):
+        self.model = model
+        self.fields = fields
+        self.key_columns = key_columns
+        self.cursor_types = cursor_types
+        self.default_fields = default_fields
+        self.joins = joins  # (model, onclause, fields needing the join)
+
+    def parse_fields(self, value):
+        if not value:
+            return list(self.default_fields)
+        names = list(dict.fromkeys(
+            name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ValueError('Unknown fields: %s' % ', '.join(unknown))
+        return names
+
+    def query(self, names):
+        columns = {name: self.fields[name].label(name) for name in names}
+        for column in self.key_columns:
+            columns.setdefault(column.key, column.label(column.key))
+
+        query = db.session.query(*columns.values()).select_from(self.model)
+        for model, onclause, join_fields in self.joins:
+            if set(names) & set(join_fields):
+                query = query.join(model, onclause)
+        return query
+
+    def serialize(self, rows, names):
+        # The requested fields come first in each row, then any key column
+        # that was only read for ordering.
+        return [dict(zip(names, row)) for row in rows]
+
+
+RESOURCES = {
+    'venues': Resource(
+        Venue,
+        {name: getattr(Venue, name) for name in (
+            'id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+            'image_link', 'facebook_link', 'website_link', 'seeking_talent',
+            'seeking_description', 'num_upcoming_shows', 'num_past_shows',
+            'next_show_time', 'created_at', 'updated_at')},
+        (Venue.id,), (int,), ('id', 'name', 'city', 'state')),
+    'artists': Resource(
+        Artist,
+        {name: getattr(Artist, name) for name in (
+            'id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+            'facebook_link', 'website_link', 'seeking_venue',
+            'seeking_description', 'num_upcoming_shows', 'num_past_shows',
+            'next_show_time', 'created_at', 'updated_at')},
+        (Artist.id,), (int,), ('id', 'name', 'city', 'state')),
+    'shows': Resource(
+        Show,
+        {"id": Show.id, "venue_id": Show.venue_id,
+         "venue_name": Venue.name, "artist_id": Show.artist_id,
+         "artist_name": Artist.name, "artist_image_link": Artist.image_link,
+         "start_time": Show.start_time, "created_at": Show.created_at,
+         "updated_at": Show.updated_at},
+        (Show.start_time, Show.id), (datetime.fromisoformat, int),
+        ('id', 'venue_id', 'artist_id', 'start_time'),
+        joins=((Venue, Show.venue_id == Venue.id, ('venue_name',)),
+               (Artist, Show.artist_id == Artist.id,
+                ('artist_name', 'artist_image_link')))),
+}
+
+
+def parse_ids(value, max_ids):
+    # Comma-separated ids, in the order given and without duplicates.
+    try:
+        ids = list(dict.fromkeys(
+            int(item) for item in value.split(',') if item.strip()))
+    except ValueError:
+        raise ValueError('Invalid ids: %s' % value) from None
+    if not ids:
+        raise ValueError('No ids given.')
+    if len(ids) > max_ids:
+        raise ValueError('At most %d ids per request.' % max_ids)
+    return ids
+
+
+# ----------------------------------------------------------------------------#
+# Endpoints.
+# ----------------------------------------------------------------------------#
+
+@api.route('/<any(venues, artists, shows):name>', methods=['GET'])
+@read_replica
+def list_resource(name):
+    """
+        One page of venues, artists or shows, as {"data": [...],
+        "next_cursor": ...}. ?fields= picks the fields of each item, and
+        ?after= is the next_cursor of the previous page.
+
+        With ?ids=1,2,3 the items with these ids are returned instead, in
+        that order, in one query; ids not found are listed in "missing".
+    """
+    resource = RESOURCES[name]
+    config = current_app.config
+    try:
+        names = resource.parse_fields(request.args.get('fields'))
+        if 'ids' in request.args:
+            ids = parse_ids(request.args['ids'], config['API_MAX_IDS'])
+        else:
+            limit = min(request.args.get('limit', config['API_PER_PAGE'],
+                                         type=int), config['API_MAX_PER_PAGE'])
+            listing = KeysetListing(
+                resource.query(names), resource.key_columns,
+                resource.cursor_types, max(limit, 1),
+                after=request.args.get('after'),
+                batch_size=config['STREAM_BATCH_SIZE'])
+    except ValueError as error:
+        abort(400, str(error))
+
+    if 'ids' in request.args:
+        id_column = resource.model.id
+        rows = resource.query(names).add_columns(id_column.label('_id')) \
+            .filter(id_column.in_(ids)).all()
+        found = {row._id: row for row in rows}
+        return json_response({
+            "data": resource.serialize(
+                [found[item] for item in ids if item in found], names),
+            "missing": [item for item in ids if item not in found]})
+
+    data = []
+    for batch in listing.batches():
+        data.extend(resource.serialize(batch, names))
+    return json_response({"data": data, "next_cursor": listing.next_cursor})
+
+
+@api.route('/<any(venues, artists, shows):name>/export', methods=['GET'])
+@read_replica
+def export_resource(name):
+    """
+        Every venue, artist or show as newline-delimited JSON, one item per
+        line. Rows are read STREAM_BATCH_SIZE at a time and each batch is
+        sent as it is encoded, so the export is never held in memory.
+    """
+    resource = RESOURCES[name]
+    try:
+        names = resource.parse_fields(request.args.get('fields'))
+    except ValueError as error:
+        abort(400, str(error))
+
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    query = resource.query(names).order_by(*resource.key_columns) \
+        .yield_per(batch_size)
+
+    def generate():
+        batch = []
+        for row in query:
+            batch.append(dumps(dict(zip(names, row))))
+            if len(batch) == batch_size:
+                yield b'\n'.join(batch) + b'\n'
+                batch = []
+        if batch:
+            yield b'\n'.join(batch) + b'\n'
+
+    return current_app.response_class(stream_with_context(generate()),
+                                      mimetype='application/x-ndjson')
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return json_response({"error": error.description}, error.code)
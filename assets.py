@@ -0,0 +1,308 @@
+import gzip
+import hashlib
+import importlib.util
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import threading
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+
+
+# ----------------------------------------------------------------------------#
+# Build.
+# ----------------------------------------------------------------------------#
+
+# Bundles built from files under static/, in the order they are concatenated.
+BUNDLES = {
+    'css/site.css': [
+        'css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+        'css/main.responsive.css', 'css/main.quickfix.css',
+    ],
+    # Loaded in <head>, before the page is parsed.
+    'js/head.js': [
+        'js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js',
+    ],
+    # Deferred, after jQuery.
+    'js/site.js': [
+        'js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js',
+    ],
+}
+
+# Files not worth compressing again.
+COMPRESSED_SUFFIXES = ('.jpg', '.jpeg', '.png', '.gif', '.ico', '.woff',
+                       '.woff2', '.gz', '.br')
+
+MANIFEST = 'manifest.json'
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def fingerprinted(name, data):
+    # css/site.css -> css/site.3f2a9c1d7e84.css
+    stem, suffix = posixpath.splitext(name)
+    return '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:12], suffix)
+
+
+def rewrite_css_urls(css, name, manifest, static_url):
+    """
+        Points the url() references of the stylesheet `name` at the built
+        copies of the files they name, since bundles and fingerprinted copies
+        live elsewhere than their sources. Other references are made absolute.
+    """
+    def replace(match):
+        url = match.group(2).strip()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        # Fonts are referred to with a ?#iefix or #id suffix.
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(name),
+                                                   path))
+        if target in manifest:
+            return 'url("%s/dist/%s%s")' % (static_url, manifest[target],
+                                            suffix)
+        return 'url("%s/%s%s")' % (static_url, target, suffix)
+
+    return CSS_URL.sub(replace, css)
+
+
+# Modules only builds use, imported by them: serving built assets needs none.
+BUILD_MODULES = ('brotli', 'rcssmin', 'rjsmin')
+
+
+def check_build_modules():
+    """
+        Raises a RuntimeError naming the build modules that are missing.
+        They are pinned in requirements.txt, and a build without them would
+        ship bundles that are not minified and lack their Brotli variants.
+    """
+    missing = [name for name in BUILD_MODULES
+               if importlib.util.find_spec(name) is None]
+    if missing:
+        raise RuntimeError('Cannot build assets without %s; install the '
+                           'packages in requirements.txt.'
+                           % ', '.join(missing))
+
+
+def minify(name, text):
+    if name.endswith('.css'):
+        import rcssmin
+        return rcssmin.cssmin(text)
+    if name.endswith('.js'):
+        import rjsmin
+        return rjsmin.jsmin(text)
+    return text
+
+
+def write_file(path, data):
+    # Written to a temporary file of its own first, so that a server never
+    # sends a partial asset, even with two builds running at once.
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix='.',
+                                     suffix='.tmp', delete=False) as file:
+        file.write(data)
+    try:
+        os.chmod(file.name, 0o644)
+        os.replace(file.name, path)
+    except OSError:
+        os.remove(file.name)
+        raise
+
+
+def write_asset(dist_dir, name, data):
+    # The asset, and its gzip and Brotli variants when they are smaller.
+    path = os.path.join(dist_dir, name)
+    write_file(path, data)
+    if name.endswith(COMPRESSED_SUFFIXES):
+        return
+    compressed = gzip.compress(data, 9, mtime=0)
+    if len(compressed) < len(data):
+        write_file(path + '.gz', compressed)
+    import brotli
+    compressed = brotli.compress(data, quality=11)
+    if len(compressed) < len(data):
+        write_file(path + '.br', compressed)
+
+
+def build(static_dir, dist_dir, static_url):
+    """
+        Builds the assets into `dist_dir`: every file under `static_dir`, and
+        the minified BUNDLES. Each is named after a hash of its content and
+        precompressed, and manifest.json maps the source names to the built
+        ones. Returns the manifest. Raises a RuntimeError, before writing
+        anything, when a build module is missing.
+
+        Files from earlier builds are left in place, so that pages rendered
+        before a deploy can still load theirs.
+    """
+    check_build_modules()
+    manifest = {}
+    sources = []
+    for directory, subdirectories, files in os.walk(static_dir):
+        subdirectories[:] = sorted(
+            subdirectory for subdirectory in subdirectories
+            if os.path.abspath(os.path.join(directory, subdirectory))
+            != os.path.abspath(dist_dir))
+        for file_name in sorted(files):
+            path = os.path.join(directory, file_name)
+            sources.append(os.path.relpath(path, static_dir).replace(os.sep,
+                                                                     '/'))
+
+    # Plain files first, so that stylesheets can refer to their copies.
+    for name in sources:
+        if name.endswith('.css'):
+            continue
+        with open(os.path.join(static_dir, name), 'rb') as file:
+            data = file.read()
+        manifest[name] = fingerprinted(name, data)
+        write_asset(dist_dir, manifest[name], data)
+
+    def read_text(name):
+        with open(os.path.join(static_dir, name), encoding='utf-8') as file:
+            text = file.read()
+        if name.endswith('.css'):
+            text = rewrite_css_urls(text, name, manifest, static_url)
+        return text
+
+    for name in sources:
+        if name.endswith('.css'):
+            data = read_text(name).encode()
+            manifest[name] = fingerprinted(name, data)
+            write_asset(dist_dir, manifest[name], data)
+
+    for name, parts in BUNDLES.items():
+        # Scripts are separated by ';', in case one lacks its last one.
+        separator = '\n' if name.endswith('.css') else ';\n'
+        data = separator.join(minify(name, read_text(part))
+                              for part in parts).encode()
+        manifest[name] = fingerprinted(name, data)
+        write_asset(dist_dir, manifest[name], data)
+
+    write_file(os.path.join(dist_dir, MANIFEST),
+               json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+# ----------------------------------------------------------------------------#
+# Flask integration.
+# ----------------------------------------------------------------------------#
+
+class Assets:
+    """
+        Fingerprinted, precompressed static assets. `flask build-assets`
+        builds them into ASSETS_DIST_DIR, served under /static/dist/, and
+        templates link them with asset_url('css/site.css'). Requests never
+        build them: without a build, asset_url() links the plain files under
+        /static/. Under gunicorn, the master builds them before forking the
+        workers when there is no build yet (see warmup.py).
+
+        Built assets are sent as Brotli or gzip when the client accepts it,
+        with a Cache-Control that lets browsers and CDNs keep them for good:
+        a changed file gets a new name.
+    """
+
+    max_age = 365 * 24 * 3600
+
+    def __init__(self, app=None):
+        self.manifest = None
+        self.version = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.manifest = None
+        self.version = None
+        app.add_url_rule('/static/dist/<path:filename>', 'asset',
+                         self.asset_view)
+        app.jinja_env.globals['asset_url'] = asset_url
+
+        @app.cli.command('build-assets')
+        def build_assets_command():
+            """Bundle, fingerprint and precompress the static assets."""
+            try:
+                manifest = self.build(app)
+            except RuntimeError as error:
+                raise click.ClickException(str(error))
+            click.echo('%d assets built into %s' % (
+                len(manifest), app.config['ASSETS_DIST_DIR']))
+
+    def build(self, app):
+        with self.lock:
+            manifest = build(app.static_folder, app.config['ASSETS_DIST_DIR'],
+                             app.static_url_path)
+            self.set_manifest(manifest)
+        return manifest
+
+    def set_manifest(self, manifest):
+        self.manifest = manifest
+        self.version = hashlib.sha256(
+            json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+
+    def load(self, app, build=False):
+        """
+            The manifest, read once per process. When there is none, the
+            assets are built if `build` is true, and otherwise the manifest
+            is empty, so that the plain static files are linked.
+        """
+        if self.manifest is None:
+            path = os.path.join(app.config['ASSETS_DIST_DIR'], MANIFEST)
+            try:
+                with open(path) as file:
+                    with self.lock:
+                        self.set_manifest(json.load(file))
+            except FileNotFoundError:
+                if build:
+                    app.logger.info('No asset manifest at %s; building one',
+                                    path)
+                    self.build(app)
+                else:
+                    app.logger.warning('No asset manifest at %s; serving '
+                                       'unbuilt assets. Run flask '
+                                       'build-assets.', path)
+                    with self.lock:
+                        self.set_manifest({})
+        return self.manifest
+
+    def url(self, name):
+        manifest = self.load(current_app)
+        if name in manifest:
+            return url_for('asset', filename=manifest[name])
+        return url_for('static', filename=name)
+
+    def asset_view(self, filename):
+        dist_dir = current_app.config['ASSETS_DIST_DIR']
+        mimetype = mimetypes.guess_type(filename)[0] or \
+            'application/octet-stream'
+
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[candidate] and os.path.isfile(
+                    os.path.join(dist_dir, filename + suffix)):
+                encoding = candidate
+                filename += suffix
+                break
+
+        response = send_from_directory(dist_dir, filename, mimetype=mimetype,
+                                       max_age=self.max_age,
+                                       conditional=True)
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def asset_url(name):
+    # Template global: URL of the built asset for a file under static/ or a
+    # bundle, falling back to the plain static file.
+    return assets.url(name)
+
+
+assets = Assets()
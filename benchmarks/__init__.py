@@ -0,0 +1,21 @@
+"""
+    Route-level benchmarks for Fyyur.
+
+        python -m benchmarks seed --venues 10000 --artists 100000 --shows 5000000
+        python -m benchmarks run --out bench_results.json --baseline old.json
+
+    For a quick cycle without a database server, seed and run in one process
+    against in-memory SQLite:
+
+        DATABASE_URL=sqlite:// python -m benchmarks run --seed --venues 500 \
+            --artists 2000 --shows 50000
+
+    Cold starts, from the first import to the first response, are timed in
+    fresh processes:
+
+        python -m benchmarks startup --runs 10 --budget-ms 1000
+
+    The seed and run commands work on the database configured for the app,
+    which should be a disposable one: seeding appends synthetic rows, and
+    the run submits the create and edit forms.
+"""
@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    volumes = argparse.ArgumentParser(add_help=False)
+    volumes.add_argument('--venues', type=int, default=10000)
+    volumes.add_argument('--artists', type=int, default=100000)
+    volumes.add_argument('--shows', type=int, default=5000000)
+    volumes.add_argument('--skew', type=float, default=1.1,
+                         help='Zipf exponent of venue and artist popularity.')
+    volumes.add_argument('--batch-size', type=int, default=10000)
+
+    seed = commands.add_parser('seed', parents=[volumes],
+                               help='Append synthetic data.')
+    seed.add_argument('--random-seed', type=int, default=0)
+
+    run = commands.add_parser('run', parents=[volumes],
+                              help='Benchmark every route.')
+    run.add_argument('--seed', action='store_true',
+                     help='Seed the given volumes first, as needed with an '
+                          'in-memory SQLite database (DATABASE_URL=sqlite://).')
+    run.add_argument('--iterations', type=int, default=50)
+    run.add_argument('--warmup', type=int, default=3)
+    run.add_argument('--only', nargs='*',
+                     help='Route names to run, all of them by default.')
+    run.add_argument('--out', help='Save the results as JSON.')
+    run.add_argument('--baseline', help='Compare with saved JSON results.')
+    run.add_argument('--max-regression', type=float, default=None,
+                     help='Fail when a p95 grows by more than this percent.')
+    run.add_argument('--cache', action='store_true',
+                     help='Keep the page cache on; by default every request '
+                          'reaches the database.')
+    run.add_argument('--memory', action='store_true',
+                     help='Also measure the peak memory of each route.')
+    run.add_argument('--no-stream', action='store_true',
+                     help='Render every page in memory, for comparison.')
+    run.add_argument('--random-seed', type=int, default=0)
+
+    startup = commands.add_parser(
+        'startup', help='Time a fresh process from import to first response.')
+    startup.add_argument('--runs', type=int, default=10)
+    startup.add_argument('--path', default='/venues',
+                         help='Path of the first request.')
+    startup.add_argument('--budget-ms', type=float, default=1000,
+                         help='Fail when the median time to first response '
+                              'exceeds this.')
+    startup.add_argument('--out', help='Save the results as JSON.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    os.environ.setdefault('FYYUR_CONFIG', 'bench')
+    if args.command == 'run' and args.cache:
+        os.environ['CACHE_TYPE'] = 'lru'
+    if args.command == 'run' and args.no_stream:
+        os.environ['STREAM_TEMPLATES'] = '0'
+
+    if args.command == 'startup':
+        from benchmarks import startup
+        results = startup.run(args.runs, args.path)
+        if args.out:
+            startup.save(results, args.out)
+        return 0 if startup.check(results, args.budget_ms) else 1
+
+    # Imported late, so that the settings above apply to the app.
+    from app import create_app
+    from models import db
+    app = create_app()
+
+    if args.command == 'seed' or args.seed:
+        from benchmarks.seed import seed
+        with app.app_context():
+            seed(db, args.venues, args.artists, args.shows, args.skew,
+                 args.batch_size, args.random_seed)
+        if args.command == 'seed':
+            return 0
+
+    from benchmarks import run
+    results = run.run(app, db, args.iterations, args.warmup, args.only,
+                      args.random_seed, args.memory)
+    if args.out:
+        run.save(results, args.out)
+    if args.baseline:
+        if not run.compare(results, run.load(args.baseline),
+                           args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
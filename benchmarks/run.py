@@ -0,0 +1,273 @@
+import json
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# ----------------------------------------------------------------------------#
+# Statement counting.
+# ----------------------------------------------------------------------------#
+
+class StatementCounter:
+    # Counts statements issued through any engine.
+
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, 'before_cursor_execute', self.before_execute)
+
+    def before_execute(self, *args):
+        self.count += 1
+
+    def reset(self):
+        count = self.count
+        self.count = 0
+        return count
+
+
+# ----------------------------------------------------------------------------#
+# Routes.
+# ----------------------------------------------------------------------------#
+
+NEXT_LINK = re.compile(r'href="(/shows\?[^"]*after=[^"]+)"')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def venue_form(rng):
+    return {
+        "name": 'Bench Venue %d' % rng.randrange(10 ** 9),
+        "city": 'Austin', "state": 'TX', "address": '1 Bench Street',
+        "phone": '512-555-0100', "genres": ['Jazz'],
+        "facebook_link": 'https://www.facebook.com/benchvenue',
+        "website_link": 'https://bench.example.com', "image_link": '',
+        "seeking_description": '',
+    }
+
+
+def artist_form(rng):
+    return {
+        "name": 'Bench Artist %d' % rng.randrange(10 ** 9),
+        "city": 'Austin', "state": 'TX', "phone": '512-555-0101',
+        "genres": ['Jazz'],
+        "facebook_link": 'https://www.facebook.com/benchartist',
+        "website_link": 'https://bench.example.com', "image_link": '',
+        "seeking_description": '',
+    }
+
+
+def build_routes(client, rng, venue_ids, artist_ids, search_terms):
+    """
+        Benchmarked routes, as name -> callable issuing one request. Detail
+        pages alternate between the most popular entities, which hold most
+        of the shows, and random ones.
+    """
+    def pick(ids):
+        if rng.random() < 0.5:
+            return ids[rng.randrange(min(10, len(ids)))]
+        return rng.choice(ids)
+
+    def deep_shows_page():
+        # Follows the keyset cursor a few pages into the listing.
+        response = client.get('/shows')
+        for _ in range(5):
+            match = NEXT_LINK.search(response.get_data(as_text=True))
+            if not match:
+                break
+            response = client.get(match.group(1).replace('&amp;', '&'))
+        return response
+
+    def show_form():
+        start_time = datetime.now() + timedelta(days=rng.randint(1, 365))
+        return {"venue_id": str(pick(venue_ids)),
+                "artist_id": str(pick(artist_ids)),
+                "start_time": start_time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    routes = {
+        'venues': lambda: client.get('/venues'),
+        'show_venue': lambda: client.get('/venues/%d' % pick(venue_ids)),
+        'artists': lambda: client.get('/artists'),
+        'show_artist': lambda: client.get('/artists/%d' % pick(artist_ids)),
+        'search_venues': lambda: client.post(
+            '/venues/search', data={"search_term": rng.choice(search_terms)}),
+        'search_artists': lambda: client.post(
+            '/artists/search', data={"search_term": rng.choice(search_terms)}),
+        'shows': lambda: client.get('/shows'),
+        'shows_upcoming': lambda: client.get('/shows?upcoming=1'),
+        'shows_deep_pages': deep_shows_page,
+        'edit_venue': lambda: client.get('/venues/%d/edit' % pick(venue_ids)),
+        'edit_artist': lambda: client.get(
+            '/artists/%d/edit' % pick(artist_ids)),
+        'create_venue_submission': lambda: client.post(
+            '/venues/create', data=venue_form(rng)),
+        'create_artist_submission': lambda: client.post(
+            '/artists/create', data=artist_form(rng)),
+        'create_show_submission': lambda: client.post(
+            '/shows/create', data=show_form()),
+        'edit_venue_submission': lambda: client.post(
+            '/venues/%d/edit' % pick(venue_ids), data=venue_form(rng)),
+        'edit_artist_submission': lambda: client.post(
+            '/artists/%d/edit' % pick(artist_ids), data=artist_form(rng)),
+    }
+    return routes
+
+
+def complete(response):
+    # Reads the whole body, as streamed pages render while being read. Like
+    # a server, drops each chunk once it has been read.
+    for _ in response.response:
+        pass
+    response.close()
+    return response
+
+
+def peak_memory(request, samples=3):
+    # Largest Python heap growth while serving one request, in KiB.
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            complete(request())
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return round(max(peaks) / 1024, 1)
+
+
+def benchmark_route(request, counter, iterations, warmup, memory=False):
+    for _ in range(warmup):
+        complete(request())
+
+    latencies = []
+    statements = []
+    errors = 0
+    for _ in range(iterations):
+        counter.reset()
+        started_at = time.perf_counter()
+        response = complete(request())
+        latencies.append((time.perf_counter() - started_at) * 1000)
+        statements.append(counter.reset())
+        if response.status_code >= 400:
+            errors += 1
+
+    results = {
+        "iterations": iterations, "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "statements_median": statistics.median(statements),
+        "statements_max": max(statements),
+    }
+    if memory:
+        # Measured apart, since tracing slows every allocation down.
+        results["peak_memory_kib"] = peak_memory(request)
+    return results
+
+
+def run(app, db, iterations=50, warmup=3, only=None, random_seed=0,
+        memory=False):
+    """
+        Runs every route `iterations` times through the Flask test client,
+        and returns the results dictionary saved by the command line. With
+        `memory`, each route's peak heap growth per request is measured too.
+    """
+    from models import Artist, Venue
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    rng = random.Random(random_seed)
+    counter = StatementCounter()
+
+    with app.app_context():
+        venue_ids = [row.id for row in
+                     db.session.query(Venue.id).order_by(Venue.id)]
+        artist_ids = [row.id for row in
+                      db.session.query(Artist.id).order_by(Artist.id)]
+        database = repr(db.engine.url)  # The password is masked.
+        db.session.remove()
+    if not venue_ids or not artist_ids:
+        sys.exit('No venues or artists to benchmark; run the seed command.')
+
+    search_terms = ['hop', 'Music', 'band', 'Velvet Lounge', 'a', 'zz']
+    client = app.test_client()
+    routes = build_routes(client, rng, venue_ids, artist_ids, search_terms)
+
+    results = {}
+    for name, request in routes.items():
+        if only and name not in only:
+            continue
+        results[name] = benchmark_route(request, counter, iterations, warmup,
+                                        memory)
+        print('%-26s p50 %8.2f ms  p95 %8.2f ms  p99 %8.2f ms  %5s stmts%s' % (
+            name, results[name]["p50_ms"], results[name]["p95_ms"],
+            results[name]["p99_ms"], results[name]["statements_median"],
+            '  %9.1f KiB peak' % results[name]["peak_memory_kib"]
+            if memory else ''))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "database": database,
+            "venues": len(venue_ids), "artists": len(artist_ids),
+            "iterations": iterations,
+            "stream_templates": app.config.get('STREAM_TEMPLATES', False),
+        },
+        "routes": results,
+    }
+
+
+# ----------------------------------------------------------------------------#
+# Baseline comparison.
+# ----------------------------------------------------------------------------#
+
+def compare(results, baseline, max_regression):
+    """
+        Prints each route against the baseline run. Returns False when a
+        route's p95 got slower by more than `max_regression` percent, or when
+        it issues more statements than before.
+    """
+    ok = True
+    for name, current in results["routes"].items():
+        previous = baseline["routes"].get(name)
+        if previous is None:
+            print('%-26s (not in baseline)' % name)
+            continue
+
+        p95_change = (current["p95_ms"] - previous["p95_ms"]) \
+            / previous["p95_ms"] * 100 if previous["p95_ms"] else 0.0
+        flags = []
+        if max_regression is not None and p95_change > max_regression:
+            flags.append('SLOWER')
+        if current["statements_max"] > previous["statements_max"]:
+            flags.append('MORE STATEMENTS')
+        ok = ok and not flags
+
+        print('%-26s p95 %8.2f -> %8.2f ms (%+6.1f%%)  stmts %s -> %s  %s' % (
+            name, previous["p95_ms"], current["p95_ms"], p95_change,
+            previous["statements_max"], current["statements_max"],
+            ' '.join(flags)))
+    return ok
+
+
+def save(results, path):
+    with open(path, 'w') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as results_file:
+        return json.load(results_file)
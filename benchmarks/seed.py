@@ -0,0 +1,152 @@
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from Genre import Genre
+from State import State
+
+
+# ----------------------------------------------------------------------------#
+# Synthetic data.
+# ----------------------------------------------------------------------------#
+
+CITIES = ['San Francisco', 'New York', 'Austin', 'Chicago', 'Seattle',
+          'Portland', 'Nashville', 'Denver', 'Boston', 'Atlanta', 'Miami',
+          'Detroit', 'Springfield', 'Columbus', 'Madison', 'Richmond']
+WORDS = ['Musical', 'Hop', 'Park', 'Square', 'Live', 'Music', 'Coffee',
+         'Wild', 'Sax', 'Band', 'Guns', 'Petals', 'Dueling', 'Pianos', 'Bar',
+         'Blue', 'Note', 'Velvet', 'Lounge', 'Echo', 'Hall', 'Garden', 'Room',
+         'Electric', 'Fox', 'Theatre', 'Crystal', 'Ballroom', 'Lantern']
+GENRES = [genre.value for genre in Genre]
+STATES = [state.value for state in State]
+
+
+def zipf_weights(count, exponent):
+    # Cumulative weights of a Zipf-like popularity distribution over ranks.
+    return list(itertools.accumulate(1.0 / (rank ** exponent)
+                                     for rank in range(1, count + 1)))
+
+
+def fake_name(rng, index):
+    return '%s %s %s %d' % (rng.choice(WORDS), rng.choice(WORDS),
+                            rng.choice(WORDS), index)
+
+
+def venue_rows(rng, count):
+    for index in range(count):
+        yield {
+            "name": fake_name(rng, index), "city": rng.choice(CITIES),
+            "state": rng.choice(STATES),
+            "address": '%d %s Street' % (rng.randint(1, 9999),
+                                         rng.choice(WORDS)),
+            "phone": '%03d-%03d-%04d' % (rng.randint(200, 999),
+                                         rng.randint(0, 999),
+                                         rng.randint(0, 9999)),
+            "genres": rng.sample(GENRES, rng.randint(1, 3)),
+            "image_link": 'https://images.example.com/venues/%d.jpg' % index,
+            "facebook_link": 'https://www.facebook.com/venue%d' % index,
+            "website_link": 'https://venue%d.example.com' % index,
+            "seeking_talent": rng.random() < 0.5,
+            "seeking_description": 'Looking for local acts.',
+        }
+
+
+def artist_rows(rng, count):
+    for index in range(count):
+        yield {
+            "name": fake_name(rng, index), "city": rng.choice(CITIES),
+            "state": rng.choice(STATES),
+            "phone": '%03d-%03d-%04d' % (rng.randint(200, 999),
+                                         rng.randint(0, 999),
+                                         rng.randint(0, 9999)),
+            "genres": rng.sample(GENRES, rng.randint(1, 3)),
+            "image_link": 'https://images.example.com/artists/%d.jpg' % index,
+            "facebook_link": 'https://www.facebook.com/artist%d' % index,
+            "website_link": 'https://artist%d.example.com' % index,
+            "seeking_venue": rng.random() < 0.5,
+            "seeking_description": 'Looking for places to play.',
+        }
+
+
+def show_rows(rng, count, venue_ids, artist_ids, exponent, batch_size):
+    """
+        Shows spread from two years back to one year ahead. Venues and
+        artists are picked with Zipf-like popularity, so a few of them hold
+        most of the shows, as in real listings.
+    """
+    venue_weights = zipf_weights(len(venue_ids), exponent)
+    artist_weights = zipf_weights(len(artist_ids), exponent)
+    now = datetime.now(timezone.utc)
+    span = int(timedelta(days=3 * 365).total_seconds())
+    start = now - timedelta(days=2 * 365)
+
+    remaining = count
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        venues = rng.choices(venue_ids, cum_weights=venue_weights, k=size)
+        artists = rng.choices(artist_ids, cum_weights=artist_weights, k=size)
+        yield [{"venue_id": venue_id, "artist_id": artist_id,
+                "start_time": start + timedelta(seconds=rng.randrange(span))}
+               for venue_id, artist_id in zip(venues, artists)]
+        remaining -= size
+
+
+def batched(rows, batch_size):
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_batches(db, table, batches, label):
+    inserted = 0
+    started_at = time.perf_counter()
+    for batch in batches:
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        inserted += len(batch)
+        print('\r%s: %d rows (%.0f rows/s)' % (
+            label, inserted, inserted / (time.perf_counter() - started_at)),
+              end='', flush=True)
+    print()
+
+
+def seed(db, venues, artists, shows, exponent=1.1, batch_size=10000,
+         random_seed=0):
+    """
+        Appends `venues`, `artists` and `shows` synthetic rows to the
+        database, inserting in batches through executemany.
+    """
+    from models import Artist, Show, Venue, init_db
+
+    # The app never creates tables itself; new benchmark databases, such as
+    # in-memory SQLite, get the schema here, from the migrations, so that
+    # they have the indexes only the migrations create.
+    if not db.inspect(db.engine).get_table_names():
+        init_db()
+
+    rng = random.Random(random_seed)
+    insert_batches(db, Venue.__table__,
+                   batched(venue_rows(rng, venues), batch_size), 'venues')
+    insert_batches(db, Artist.__table__,
+                   batched(artist_rows(rng, artists), batch_size), 'artists')
+
+    venue_ids = [row.id for row in db.session.query(Venue.id)]
+    artist_ids = [row.id for row in db.session.query(Artist.id)]
+    if shows and venue_ids and artist_ids:
+        insert_batches(db, Show.__table__,
+                       show_rows(rng, shows, venue_ids, artist_ids, exponent,
+                                 batch_size), 'shows')
+
+    # Shows are inserted directly, so the venue and artist show counters and
+    # summaries are computed once at the end.
+    from counters import recount
+    from summaries import refresh
+    recount(Venue)
+    recount(Artist)
+    refresh('venue')
+    refresh('artist')
+    db.session.commit()
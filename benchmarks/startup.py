@@ -0,0 +1,94 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Runs in a fresh interpreter, and prints its timings as one JSON line.
+STARTUP_SCRIPT = '''
+import json, sys, time
+started_at = time.perf_counter()
+from app import create_app
+imported_at = time.perf_counter()
+app = create_app()
+created_at = time.perf_counter()
+response = app.test_client().get(sys.argv[1])
+# Streamed pages render as their body is read, as in run.complete().
+for _ in response.response:
+    pass
+response.close()
+answered_at = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported_at - started_at) * 1000,
+    "create_app_ms": (created_at - imported_at) * 1000,
+    "first_request_ms": (answered_at - created_at) * 1000,
+    "ready_ms": (answered_at - started_at) * 1000,
+    "status": response.status_code,
+}))
+'''
+
+PHASES = ('import_ms', 'create_app_ms', 'first_request_ms', 'ready_ms',
+          'process_ms')
+
+
+def measure(path):
+    # One cold start: import, create_app() and a first request to `path`.
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    started_at = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, path],
+                               cwd=root, capture_output=True, text=True)
+    process_ms = (time.perf_counter() - started_at) * 1000
+    if completed.returncode != 0:
+        sys.exit('Startup failed:\n' + completed.stderr)
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = process_ms
+    return timings
+
+
+def run(runs=10, path='/venues'):
+    """
+        Starts the app `runs` times in fresh processes, and returns the
+        median and worst time of each startup phase. ready_ms runs from the
+        first import to the first response; process_ms adds the interpreter
+        start and exit.
+    """
+    samples = [measure(path) for _ in range(runs)]
+    errors = sum(1 for sample in samples if sample["status"] >= 400)
+
+    phases = {}
+    for phase in PHASES:
+        values = [sample[phase] for sample in samples]
+        phases[phase] = {"median": round(statistics.median(values), 3),
+                         "max": round(max(values), 3)}
+        print('%-18s median %8.2f ms  max %8.2f ms' % (
+            phase, phases[phase]["median"], phases[phase]["max"]))
+    if errors:
+        print('%d of %d first requests to %s failed.' % (errors, runs, path))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "runs": runs, "path": path, "errors": errors,
+        },
+        "phases": phases,
+    }
+
+
+def check(results, budget_ms):
+    # False when the median time to first response is over budget, or when
+    # the first requests failed.
+    ready_ms = results["phases"]["ready_ms"]["median"]
+    if budget_ms is not None and ready_ms > budget_ms:
+        print('Median time to first response %.2f ms exceeds the %.2f ms '
+              'budget.' % (ready_ms, budget_ms))
+        return False
+    return not results["meta"]["errors"]
+
+
+def save(results, path):
+    with open(path, 'w') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
@@ -0,0 +1,542 @@
+import hashlib
+import logging
+import os
+import pickle
+import queue
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, g, make_response, request, \
+    session, stream_with_context
+from flask_wtf.csrf import generate_csrf
+from werkzeug.http import is_resource_modified
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from queries import show_day_boundary
+from versions import template_digest
+
+purge_logger = logging.getLogger('fyyur.purge')
+
+
+# ----------------------------------------------------------------------------#
+# Backends.
+# ----------------------------------------------------------------------------#
+
+class NullBackend:
+    # Stores nothing; used when caching is switched off.
+
+    def get(self, key):
+        return None
+
+    def get_many(self, keys):
+        return [None] * len(keys)
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUBackend:
+    """
+        In-process cache bounded by the total size of its values. Strings and
+        bytes count by their length, tuples by the sum of their items, and
+        anything else as a small fixed size.
+        Least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()  # key -> (expires_at, value, size)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def value_size(cls, value):
+        if isinstance(value, (str, bytes)):
+            return len(value)
+        if isinstance(value, tuple):
+            return sum(cls.value_size(item) for item in value)
+        return 64
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] < time.time():
+                self.size -= entry[2]
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        size = self.value_size(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.time() + timeout if timeout else None
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self.entries[key] = (expires_at, value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted[2]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class FileSystemBackend:
+    """
+        Cache kept as one pickle file per key in a shared directory, so that
+        all gunicorn workers on a host see the same entries. Files are
+        replaced atomically, and the oldest ones are pruned once the
+        directory holds more than `max_entries`.
+    """
+
+    prune_every = 256  # Writes between two prune passes.
+
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory,
+                            hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as cache_file:
+                expires_at, value = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.time() + timeout if timeout else None
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as cache_file:
+                pickle.dump((expires_at, value), cache_file,
+                            pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        self.writes += 1
+        if self.writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.is_file() and not entry.name.endswith('.tmp')]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# ----------------------------------------------------------------------------#
+# CDN purges.
+# ----------------------------------------------------------------------------#
+
+class SurrogateKeyPurger:
+    """
+        Purges pages from a CDN by surrogate key, Fastly style: a POST to
+        `url` with the keys in a Surrogate-Key header and `token` in
+        Fastly-Key. Purges are sent from a background thread, so that the
+        request invalidating the pages does not wait for the CDN, and
+        failures are only logged; the pages then expire by themselves.
+    """
+
+    def __init__(self, url, token=None, timeout=5):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def __call__(self, keys):
+        with self.lock:
+            # Started on first use, in the worker process itself.
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True,
+                                               name='surrogate-key-purger')
+                self.thread.start()
+        self.queue.put(keys)
+
+    def run(self):
+        while True:
+            keys = self.queue.get()
+            headers = {"Surrogate-Key": ' '.join(keys)}
+            if self.token:
+                headers["Fastly-Key"] = self.token
+            try:
+                urllib.request.urlopen(urllib.request.Request(
+                    self.url, method='POST', headers=headers),
+                    timeout=self.timeout).close()
+            except OSError as error:
+                purge_logger.warning('Purge of %s failed: %s',
+                                     ' '.join(keys), error)
+
+
+# ----------------------------------------------------------------------------#
+# Page and fragment cache.
+# ----------------------------------------------------------------------------#
+
+# Rendered into cached pages in place of the per-session CSRF token, and
+# swapped for the caller's token when the page is served.
+CSRF_PLACEHOLDER = '__page_cache_csrf_token__'
+
+# Surrogate key of every cached page, purged when the whole cache is cleared.
+ALL_PAGES = 'pages'
+
+
+class PageCache:
+    """
+        Cache of rendered pages and template fragments. Every entry carries
+        tags, such as 'venue:3' or 'show-list', and invalidate() drops all
+        entries holding a tag. Tags are versioned with random tokens kept in
+        the backend, so invalidation from one worker is seen by all workers
+        sharing a FileSystemBackend.
+
+        Cached pages also answer conditional GETs, and carry their tags as
+        surrogate keys for a CDN. Invalidated tags are passed to the purge
+        listeners, such as a SurrogateKeyPurger when CDN_PURGE_URL is set.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.timeout = None
+        self.hits = 0
+        self.misses = 0
+        self.purge_listeners = []
+        self.cache_control = 'public, no-cache'
+        self.surrogate_max_age = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'null')
+        if cache_type == 'lru':
+            self.backend = LRUBackend(app.config['CACHE_LRU_MAX_BYTES'])
+        elif cache_type == 'filesystem':
+            self.backend = FileSystemBackend(
+                app.config['CACHE_DIR'], app.config['CACHE_DIR_MAX_ENTRIES'])
+        elif cache_type == 'null':
+            self.backend = NullBackend()
+        else:
+            raise ValueError('Unknown CACHE_TYPE: %s' % cache_type)
+        self.timeout = app.config.get('CACHE_DEFAULT_TIMEOUT')
+        self.cache_control = app.config.get('HTTP_CACHE_CONTROL',
+                                            'public, no-cache')
+        self.surrogate_max_age = app.config.get('SURROGATE_MAX_AGE', 0)
+        self.purge_listeners = []
+        if app.config.get('CDN_PURGE_URL'):
+            self.on_purge(SurrogateKeyPurger(
+                app.config['CDN_PURGE_URL'],
+                app.config.get('CDN_PURGE_TOKEN')))
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+        app.jinja_env.filters['cache_tags'] = cache_tags
+        app.context_processor(self.csrf_placeholder)
+
+    @property
+    def enabled(self):
+        return not isinstance(self.backend, NullBackend)
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        # The (value, tags) of a valid entry, or None.
+        entry = self.backend.get('entry:' + key)
+        if entry is not None:
+            value, tag_versions = entry
+            current_versions = self.backend.get_many(
+                ['tag:' + tag for tag in tag_versions])
+            if list(tag_versions.values()) == current_versions:
+                self.hits += 1
+                return value, set(tag_versions)
+        self.misses += 1
+        return None
+
+    def set(self, key, value, tags=(), tag_versions=None):
+        """
+            Stores `value` under `key` with `tags`, at the versions in
+            `tag_versions`: those read before the value was built, so that
+            an invalidation made while it was being built leaves it stale.
+            Versions of other tags are read now.
+        """
+        tag_versions = dict(tag_versions or {})
+        tag_versions.update(self.tag_versions(
+            tag for tag in tags if tag not in tag_versions))
+        self.backend.set('entry:' + key, (value, tag_versions), self.timeout)
+
+    def tag_versions(self, tags):
+        # The current version of each tag, as a dictionary.
+        tag_versions = {}
+        for tag in tags:
+            version = self.backend.get('tag:' + tag)
+            if version is None:
+                version = self.new_tag_version(tag)
+            tag_versions[tag] = version
+        return tag_versions
+
+    def new_tag_version(self, tag):
+        version = uuid.uuid4().hex
+        self.backend.set('tag:' + tag, version)
+        return version
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.new_tag_version(tag)
+        self.purge(tags)
+
+    def clear(self):
+        self.backend.clear()
+        self.purge((ALL_PAGES,))
+
+    def on_purge(self, listener):
+        # `listener(tags)` is called with the tags of every invalidation.
+        self.purge_listeners.append(listener)
+        return listener
+
+    def purge(self, tags):
+        for listener in self.purge_listeners:
+            listener(tuple(tags))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    # Pages.
+
+    def csrf_placeholder(self):
+        if g.get('page_cache_tags') is not None:
+            return {"csrf_token": lambda: CSRF_PLACEHOLDER}
+        return {}
+
+    def cached_page(self, *tags, version=None):
+        """
+            Caches the HTML returned by a view, keyed on the request path and
+            query string. `tags` may refer to view arguments, as in
+            'venue:{venue_id}'; the view can add more with add_cache_tags().
+            Requests with pending flash messages bypass the cache. Streamed
+            pages are cached once they have been sent in full.
+
+            `version(**view_args)` returns the PageVersion of the page, or
+            None when it has none. A client already holding that version
+            gets a 304 without the page being rendered. Pages with a version
+            are cached under it, so the cached body always matches the ETag
+            it is sent with. Pages without one are cached under the current
+            day, since pages split shows into past and upcoming, and under
+            the template and asset digest.
+
+            Pages are sent with HTTP_CACHE_CONTROL and with their tags as
+            surrogate keys. They vary on Cookie, since their forms carry the
+            session's CSRF token.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if session.get('_flashes'):
+                    # Messages are for this client only.
+                    response = make_response(view(*args, **kwargs))
+                    response.headers["Cache-Control"] = 'private, no-store'
+                    return response
+
+                page_tags = {tag.format(**kwargs) for tag in tags}
+                page_version = version(**kwargs) if version else None
+                # Read by the entity cache, for renders to match it.
+                g.page_version = page_version
+                if page_version is not None and not is_resource_modified(
+                        request.environ, page_version.etag,
+                        last_modified=page_version.last_modified):
+                    response = current_app.response_class(status=304)
+                    return self.add_http_headers(response, page_tags,
+                                                 page_version)
+
+                if page_version is not None:
+                    # Only served for the version it was rendered for; that
+                    # covers the templates, assets and day too.
+                    key = 'page:%s:%s' % (page_version.etag,
+                                          request.full_path)
+                else:
+                    key = 'page:%s:%s:%s' % (
+                        template_digest(),
+                        show_day_boundary().date().isoformat(),
+                        request.full_path)
+                entry = self.get_entry(key) if self.enabled else None
+                if entry is not None:
+                    page, page_tags = entry
+                else:
+                    # Read before rendering: see set().
+                    tag_versions = self.tag_versions(page_tags) \
+                        if self.enabled else None
+                    g.page_cache_tags = page_tags
+                    g.page_cache_versions = tag_versions
+                    try:
+                        page = view(*args, **kwargs)
+                        page_tags = g.page_cache_tags
+                    finally:
+                        g.page_cache_tags = g.page_cache_versions = None
+                    if isinstance(page, Response) and page.is_streamed:
+                        # Tags read while streaming come too late for the
+                        # headers; they still go with the cached page.
+                        headers_tags = set(page_tags)
+                        page.response = stream_with_context(
+                            self.store_streamed(key, page.response,
+                                                page_tags, tag_versions))
+                        return self.add_http_headers(page, headers_tags,
+                                                     page_version)
+                    if not isinstance(page, str):
+                        return page
+                    if self.enabled:
+                        self.set(key, page, page_tags, tag_versions)
+
+                if CSRF_PLACEHOLDER in page:
+                    page = page.replace(CSRF_PLACEHOLDER, generate_csrf())
+                return self.add_http_headers(make_response(page), page_tags,
+                                             page_version)
+
+            return wrapper
+
+        return decorator
+
+    def add_http_headers(self, response, tags, page_version):
+        if page_version is not None:
+            response.set_etag(page_version.etag, weak=True)
+            response.last_modified = page_version.last_modified
+        response.headers["Cache-Control"] = self.cache_control
+        response.vary.add('Cookie')
+        if self.surrogate_max_age:
+            response.headers["Surrogate-Control"] = \
+                'max-age=%d' % self.surrogate_max_age
+        response.headers["Surrogate-Key"] = ' '.join(
+            sorted(set(tags) | {ALL_PAGES}))
+        return response
+
+    def store_streamed(self, key, chunks, tags, tag_versions):
+        # Sends a streamed page on, and caches it once it has been sent in
+        # full. Rows read while streaming still add their tags.
+        parts = []
+        csrf_token = None
+        g.page_cache_tags = tags
+        g.page_cache_versions = tag_versions
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                if CSRF_PLACEHOLDER in chunk:
+                    csrf_token = csrf_token or generate_csrf()
+                    chunk = chunk.replace(CSRF_PLACEHOLDER, csrf_token)
+                yield chunk
+        finally:
+            g.page_cache_tags = g.page_cache_versions = None
+        if self.enabled:
+            self.set(key, ''.join(parts), tags, tag_versions)
+
+
+def add_cache_tags(*tags):
+    # Adds tags to the page being rendered for the cache, if any. Their
+    # versions are read now, right after the rows they name, rather than
+    # once the page is done.
+    page_tags = g.get('page_cache_tags')
+    if page_tags is not None:
+        tag_versions = g.get('page_cache_versions')
+        if tag_versions is not None:
+            tag_versions.update(page_cache.tag_versions(
+                tag for tag in tags if tag not in tag_versions))
+        page_tags.update(tags)
+
+
+def cache_tags(items, prefix, attribute='id'):
+    # Jinja filter: venues|cache_tags('venue') -> ['venue:1', 'venue:2', ...]
+    return ['%s:%s' % (prefix, item[attribute]) for item in items]
+
+
+class FragmentCacheExtension(Extension):
+    """
+        Caches a block of template output:
+
+            {% cache ('venue-area', area.city, area.state), tags %}
+                ...
+            {% endcache %}
+
+        The first expression is the key, the optional second one a list of
+        tags the fragment is invalidated with. Keys also hold the template
+        and asset digest, so a release does not reuse old fragments.
+    """
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(()))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('cached_fragment', args),
+                               [], [], body).set_lineno(lineno)
+
+    def cached_fragment(self, key, tags, caller):
+        fragment_cache = self.environment.fragment_cache
+        if not fragment_cache.enabled:
+            return caller()
+
+        if isinstance(key, (list, tuple)):
+            key = '|'.join(str(part) for part in key)
+        key = 'fragment:%s:%s' % (template_digest(), key)
+        fragment = fragment_cache.get(key)
+        if fragment is None:
+            tag_versions = fragment_cache.tag_versions(tags)
+            fragment = caller()
+            fragment_cache.set(key, str(fragment), tags, tag_versions)
+        return Markup(fragment)
+
+
+page_cache = PageCache()
@@ -0,0 +1,152 @@
+import click
+from flask import current_app
+
+from models import Artist, Show, Venue, db
+from queries import is_upcoming, show_day_boundary
+from summaries import refresh as refresh_summaries
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+# The counted models, with the Show foreign key pointing at each.
+COUNTED = {
+    Venue: Show.venue_id,
+    Artist: Show.artist_id,
+}
+
+
+def counter_values(model, boundary):
+    """
+        The counter columns of `model`, as correlated subqueries over its
+        shows: the upcoming and past show counts, split at `boundary`, and
+        the time of the next upcoming show.
+    """
+    show_column = COUNTED[model]
+    shows = db.select(db.func.count(Show.id)).where(show_column == model.id)
+    return {
+        "num_upcoming_shows": shows.where(
+            Show.start_time >= boundary).scalar_subquery(),
+        "num_past_shows": shows.where(
+            Show.start_time < boundary).scalar_subquery(),
+        "next_show_time": db.select(db.func.min(Show.start_time)).where(
+            show_column == model.id,
+            Show.start_time >= boundary).scalar_subquery(),
+    }
+
+
+def recount(model, ids=None):
+    """
+        Recomputes the counters of the `ids` rows of `model`, or of every
+        row, in one UPDATE. Returns the number of rows updated.
+    """
+    boundary = show_day_boundary()
+    statement = db.update(model).values(
+        **counter_values(model, boundary)).execution_options(
+        synchronize_session=False)
+    if ids is not None:
+        statement = statement.where(model.id.in_(ids))
+    return db.session.execute(statement).rowcount
+
+
+def count_show(venue_id, artist_id, start_time):
+    """
+        Adds a new show to the counters of its venue and artist, in the
+        current transaction.
+    """
+    for model, model_id in ((Venue, venue_id), (Artist, artist_id)):
+        if is_upcoming(start_time):
+            values = {
+                "num_upcoming_shows": model.num_upcoming_shows + 1,
+                "next_show_time": db.case(
+                    [(model.next_show_time.is_(None), start_time),
+                     (model.next_show_time > start_time, start_time)],
+                    else_=model.next_show_time),
+            }
+        else:
+            values = {"num_past_shows": model.num_past_shows + 1}
+        db.session.execute(
+            db.update(model).where(model.id == model_id).values(
+                **values).execution_options(synchronize_session=False))
+
+
+def roll_forward():
+    """
+        Moves the shows that started before today from the upcoming to the
+        past counters, and out of the upcoming show summaries. Only venues
+        and artists whose next show has gone past are refreshed, found
+        through the next_show_time indexes.
+    """
+    boundary = show_day_boundary()
+    batch_size = current_app.config['RECOUNT_BATCH_SIZE']
+    rolled = {}
+    for model in COUNTED:
+        ids = [row.id for row in db.session.query(model.id).filter(
+            model.next_show_time < boundary)]
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            recount(model, batch)
+            refresh_summaries(model.__tablename__, batch)
+            db.session.commit()
+        rolled[model.__tablename__] = len(ids)
+    return rolled
+
+
+def find_drift(model, first_id, last_id):
+    # Ids, between first_id and last_id, whose stored counters differ from
+    # the shows.
+    values = counter_values(model, show_day_boundary())
+    return [row.id for row in db.session.query(model.id).filter(
+        model.id.between(first_id, last_id),
+        db.or_(*(getattr(model, name).is_distinct_from(value)
+                 for name, value in values.items())))]
+
+
+# ----------------------------------------------------------------------------#
+# Flask integration.
+# ----------------------------------------------------------------------------#
+
+class ShowCounters:
+    """
+        Commands keeping the venue and artist show counters right.
+
+        `flask roll-counters` rolls shows from upcoming to past, and is meant
+        to run from cron shortly after midnight. `flask recount` compares
+        every counter with the shows, RECOUNT_BATCH_SIZE rows at a time, and
+        repairs those that drifted.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        @app.cli.command('roll-counters')
+        def roll_counters_command():
+            """Move shows that have started from upcoming to past counts."""
+            for table, count in roll_forward().items():
+                click.echo('%s: %d rolled forward' % (table, count))
+
+        @app.cli.command('recount')
+        @click.option('--check', is_flag=True,
+                      help='Report drifted counters without repairing them.')
+        def recount_command(check):
+            """Check the show counters against the shows, and repair them."""
+            batch_size = app.config['RECOUNT_BATCH_SIZE']
+            for model in COUNTED:
+                last_id = db.session.query(db.func.max(model.id)).scalar()
+                drifted = 0
+                for first_id in range(1, (last_id or 0) + 1, batch_size):
+                    ids = find_drift(model, first_id,
+                                     first_id + batch_size - 1)
+                    drifted += len(ids)
+                    if ids and not check:
+                        recount(model, ids)
+                        db.session.commit()
+                click.echo('%s: %d drifted%s' % (
+                    model.__tablename__, drifted,
+                    '' if check or not drifted else ', repaired'))
+
+
+show_counters = ShowCounters()
@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_app_context
+
+from models import Artist, Venue, db
+
+
+# ----------------------------------------------------------------------------#
+# Snapshots.
+# ----------------------------------------------------------------------------#
+
+class Record:
+    """
+        Read-only snapshot of a row, holding only the listed fields in slots.
+        Lists, such as genres, are kept as tuples.
+    """
+    __slots__ = ()
+
+    def __init__(self, row):
+        for name in self.__slots__:
+            value = getattr(row, name)
+            object.__setattr__(self, name,
+                               tuple(value) if isinstance(value, list)
+                               else value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is read-only' % type(self).__name__)
+
+    def __repr__(self):
+        return '<%s %s>' % (type(self).__name__, self.id)
+
+    def _asdict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class VenueRecord(Record):
+    __slots__ = ('id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+                 'image_link', 'facebook_link', 'website_link',
+                 'seeking_talent', 'seeking_description')
+
+
+class ArtistRecord(Record):
+    __slots__ = ('id', 'name', 'city', 'state', 'phone', 'genres',
+                 'image_link', 'facebook_link', 'website_link',
+                 'seeking_venue', 'seeking_description')
+
+
+RECORDS = {
+    Venue: VenueRecord,
+    Artist: ArtistRecord,
+}
+
+# Cached for ids that have no row, so that requests for them do not reach
+# the database either.
+MISSING = object()
+
+
+# ----------------------------------------------------------------------------#
+# Entity cache.
+# ----------------------------------------------------------------------------#
+
+class EntityCache:
+    """
+        Read-through cache of Venue and Artist snapshots keyed by (model, id),
+        in each process. Entries expire after ENTITY_CACHE_TIMEOUT seconds,
+        and the least recently used go once there are more than
+        ENTITY_CACHE_MAX_ENTRIES. Handlers writing a venue or artist call
+        invalidate(); other processes see the change once their entry
+        expires, except on cached pages.
+
+        A cached page is rendered for the PageVersion computed from the
+        database, and may be stored in a page cache shared by every worker.
+        Its render only uses entries loaded more than ENTITY_CACHE_SAFETY_LAG
+        seconds after the Last-Modified time of that version, and reloads
+        the others, so that it never shows rows older than its version.
+
+        A missing key is loaded by one thread only; the others asking for it
+        meanwhile wait for that load rather than querying too.
+    """
+
+    def __init__(self, app=None):
+        self.timeout = 300
+        self.max_entries = 10000
+        self.safety_lag = 5
+        # (model, id) -> (expires_at, loaded_at, record)
+        self.entries = OrderedDict()
+        self.loading = {}  # (model, id) -> Event set once loaded
+        self.invalidations = 0
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.timeout = app.config.get('ENTITY_CACHE_TIMEOUT', 300)
+        self.max_entries = app.config.get('ENTITY_CACHE_MAX_ENTRIES', 10000)
+        self.safety_lag = app.config.get('ENTITY_CACHE_SAFETY_LAG', 5)
+        self.clear()
+
+    def get(self, model, id):
+        # The snapshot of one row, or None when there is no such row.
+        return self.get_many(model, (id,)).get(id)
+
+    def get_many(self, model, ids):
+        """
+            Snapshots of the rows of `model` with the given ids, as a
+            dictionary by id; ids without a row are left out. The ids not
+            cached are loaded in one query.
+        """
+        found = {}
+        pending = set(ids)
+        loaded_after = self.loaded_after()
+        while pending:
+            claimed, waiting = self.lookup(model, pending, found,
+                                           loaded_after)
+            if claimed:
+                self.load(model, claimed, found)
+            for event in waiting.values():
+                event.wait(5)
+            pending = set(waiting)
+        return {id: record for id, record in found.items()
+                if record is not MISSING}
+
+    def loaded_after(self):
+        # The time entries must have been loaded after to be used for the
+        # cached page being rendered, if any.
+        page_version = g.get('page_version') if has_app_context() else None
+        if page_version is None:
+            return None
+        return page_version.last_modified.timestamp() + self.safety_lag
+
+    def lookup(self, model, ids, found, loaded_after=None):
+        # Fills `found` from the cache, and splits the other ids into those
+        # this thread loads and those already being loaded by another one.
+        claimed = []
+        waiting = {}
+        now = time.monotonic()
+        with self.lock:
+            for id in ids:
+                key = (model, id)
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] > now and (
+                        loaded_after is None or entry[1] > loaded_after):
+                    self.entries.move_to_end(key)
+                    found[id] = entry[2]
+                elif key in self.loading:
+                    waiting[id] = self.loading[key]
+                else:
+                    self.loading[key] = threading.Event()
+                    claimed.append(id)
+        return claimed, waiting
+
+    def load(self, model, ids, found):
+        record_class = RECORDS[model]
+        invalidations = self.invalidations
+        # Taken before the query, which sees every change committed by then.
+        loaded_at = time.time()
+        try:
+            columns = [getattr(model, name) for name in record_class.__slots__]
+            records = {row.id: record_class(row) for row in db.session.query(
+                *columns).filter(model.id.in_(ids))}
+        except BaseException:
+            self.release(model, ids)
+            raise
+
+        expires_at = time.monotonic() + self.timeout
+        with self.lock:
+            for id in ids:
+                record = records.get(id, MISSING)
+                found[id] = record
+                # A load that raced with an invalidation may hold old data;
+                # it is returned but not kept.
+                if invalidations == self.invalidations:
+                    self.entries[(model, id)] = (expires_at, loaded_at,
+                                                 record)
+                    self.entries.move_to_end((model, id))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self.release(model, ids)
+
+    def release(self, model, ids):
+        with self.lock:
+            for id in ids:
+                event = self.loading.pop((model, id), None)
+                if event is not None:
+                    event.set()
+
+    def invalidate(self, model, *ids):
+        with self.lock:
+            self.invalidations += 1
+            for id in ids:
+                self.entries.pop((model, id), None)
+
+    def clear(self):
+        with self.lock:
+            self.invalidations += 1
+            self.entries.clear()
+
+
+entity_cache = EntityCache()
@@ -0,0 +1,276 @@
+import csv
+import hmac
+import io
+import os
+import sys
+import zlib
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import click
+from flask import abort, current_app, request, stream_with_context
+
+from api import RESOURCES, dumps
+from models import db
+from routing import read_replica
+from versions import as_utc
+
+
+# ----------------------------------------------------------------------------#
+# Encoding.
+# ----------------------------------------------------------------------------#
+
+FORMATS = ('csv', 'ndjson')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def csv_value(value):
+    # Genres are comma separated, as `flask import` reads them.
+    if isinstance(value, list):
+        return ','.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_batches(batches, names, format):
+    """
+        Encodes batches of rows, whose first values are the `names` fields,
+        as CSV with a header line or as NDJSON. Yields one bytes chunk per
+        batch.
+    """
+    if format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for batch in batches:
+            writer.writerows([csv_value(value) for value in row[:len(names)]]
+                             for row in batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    else:
+        for batch in batches:
+            yield b''.join(dumps(dict(zip(names, row))) + b'\n'
+                           for row in batch)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip framing
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# ----------------------------------------------------------------------------#
+# Exports.
+# ----------------------------------------------------------------------------#
+
+def parse_watermark(value):
+    # An ISO 8601 time; naive ones are in UTC, as updated_at.
+    return as_utc(datetime.fromisoformat(value.strip()))
+
+
+def read_horizon():
+    """
+        The time up to which the database being read has every committed
+        change: on a Postgres read replica, the commit time of the last
+        transaction it replayed, and otherwise its current time.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        # CURRENT_TIMESTAMP only has whole seconds; this has milliseconds.
+        return parse_watermark(db.session.query(
+            db.func.strftime('%Y-%m-%d %H:%M:%f', 'now')).scalar())
+    now = db.func.now(type_=db.DateTime(timezone=True))
+    if dialect == 'postgresql':
+        now = db.func.coalesce(db.func.pg_last_xact_replay_timestamp(), now)
+    return as_utc(db.session.query(now).scalar())
+
+
+def format_watermark(watermark):
+    # Kept free of '+', so that it can go in a query string as it is.
+    return watermark.astimezone(timezone.utc).strftime(
+        '%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class Export:
+    """
+        Every field of the venues, artists or shows created or changed after
+        the `since` watermark and at most at `until`, in (updated_at, id)
+        order. Shows carry their venue and artist names.
+
+        `until` defaults to `lag` seconds before the read_horizon() of the
+        database the export reads, which may be a read replica behind the
+        primary. Rows are stamped with updated_at before their transaction
+        commits, so rows changed just before the horizon may not be visible
+        yet; with a lag longer than any write transaction, each row is
+        visible by the time an export covers its updated_at. Rows changed later are left for the next export, whose
+        watermark is this export's `until`, and updated rows are exported
+        again. Rows are read `batch_size` at a
+        time from a server-side cursor, and only one batch is held in
+        memory.
+    """
+
+    def __init__(self, name, since=None, until=None, batch_size=5000,
+                 lag=60):
+        self.resource = RESOURCES[name]
+        self.names = list(self.resource.fields)
+        self.batch_size = batch_size
+        self.since = since
+
+        model = self.resource.model
+        if until is None:
+            until = read_horizon() - timedelta(seconds=lag)
+            # Never behind the previous export.
+            if since is not None and until < since:
+                until = since
+        self.until = until
+
+        query = self.resource.query(self.names).filter(
+            model.updated_at <= until)
+        if since is not None:
+            query = query.filter(model.updated_at > since)
+        self.query = query.order_by(model.updated_at, model.id) \
+            .yield_per(batch_size)
+
+    def batches(self):
+        rows = iter(self.query)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def chunks(self, format, compress=False):
+        chunks = encode_batches(self.batches(), self.names, format)
+        return gzipped(chunks) if compress else chunks
+
+
+def read_watermark(path):
+    try:
+        with open(path) as file:
+            return parse_watermark(file.read())
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(path, watermark):
+    # Replaced atomically, so that a failed export keeps the old watermark.
+    with open(path + '.tmp', 'w') as file:
+        file.write('%s\n' % format_watermark(watermark))
+    os.replace(path + '.tmp', path)
+
+
+# ----------------------------------------------------------------------------#
+# Flask integration.
+# ----------------------------------------------------------------------------#
+
+class Exporter:
+    """
+        Bulk exports for the warehouse, as CSV or NDJSON, optionally
+        gzipped: `flask export`, and /exports/<name>.<format>[.gz] for
+        clients holding one of the EXPORT_TOKENS as a bearer token.
+
+        Both take a watermark, the time up to which an earlier export went,
+        and return only the rows added or changed since, up to
+        EXPORT_LAG_SECONDS ago. The endpoint sends the new watermark in the
+        X-Export-Watermark header; the command keeps it in a
+        --watermark-file.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.add_url_rule('/exports/<any(venues, artists, shows):name>'
+                         '.<any(csv, ndjson):format>',
+                         'export', self.export_view)
+        app.add_url_rule('/exports/<any(venues, artists, shows):name>'
+                         '.<any(csv, ndjson):format>.gz',
+                         'export_gzip', self.export_view,
+                         defaults={"compress": True})
+
+        @app.cli.command('export')
+        @click.argument('name', type=click.Choice(list(RESOURCES)))
+        @click.option('--format', type=click.Choice(FORMATS),
+                      default='csv', show_default=True)
+        @click.option('--gzip', 'compress', is_flag=True,
+                      help='Compress the output with gzip.')
+        @click.option('--output', '-o', type=click.Path(), default='-',
+                      help='Output file; standard output by default.')
+        @click.option('--since', help='Only export rows created or changed '
+                                       'after this ISO 8601 time.')
+        @click.option('--watermark-file', type=click.Path(),
+                      help='Read --since from this file, and save the new '
+                           'watermark in it once the export is complete.')
+        def export_command(name, format, compress, output, since,
+                           watermark_file):
+            """Export venues, artists or shows as CSV or NDJSON."""
+            try:
+                if since is not None:
+                    since = parse_watermark(since)
+                elif watermark_file:
+                    since = read_watermark(watermark_file)
+            except ValueError as error:
+                raise click.BadParameter(str(error), param_hint='watermark')
+            export = Export(name, since,
+                            batch_size=app.config['EXPORT_BATCH_SIZE'],
+                            lag=app.config['EXPORT_LAG_SECONDS'])
+
+            file = sys.stdout.buffer if output == '-' else open(output, 'wb')
+            try:
+                for chunk in export.chunks(format, compress):
+                    file.write(chunk)
+            finally:
+                if file is not sys.stdout.buffer:
+                    file.close()
+
+            if watermark_file:
+                write_watermark(watermark_file, export.until)
+            click.echo('%s: changes %s to %s' % (
+                name, format_watermark(since) if since else 'from the start',
+                format_watermark(export.until)), err=True)
+
+    @staticmethod
+    def authorized():
+        tokens = current_app.config.get('EXPORT_TOKENS') or ()
+        if not tokens:
+            abort(404)
+        scheme, _, token = request.headers.get('Authorization', '') \
+            .partition(' ')
+        return scheme.lower() == 'bearer' and any(
+            hmac.compare_digest(token.encode(), allowed.encode())
+            for allowed in tokens)
+
+    @read_replica
+    def export_view(self, name, format, compress=False):
+        if not self.authorized():
+            return current_app.response_class(
+                'Unauthorized', 401, {"WWW-Authenticate": 'Bearer'})
+        since = request.args.get('since', type=parse_watermark)
+        if 'since' in request.args and since is None:
+            abort(400)
+
+        export = Export(name, since,
+                        batch_size=current_app.config['EXPORT_BATCH_SIZE'],
+                        lag=current_app.config['EXPORT_LAG_SECONDS'])
+        filename = '%s.%s%s' % (name, format, '.gz' if compress else '')
+        response = current_app.response_class(
+            stream_with_context(export.chunks(format, compress)),
+            mimetype='application/gzip' if compress else MIMETYPES[format])
+        response.headers["Content-Disposition"] = \
+            'attachment; filename=%s' % filename
+        response.headers["X-Export-Watermark"] = \
+            format_watermark(export.until)
+        return response
+
+
+exporter = Exporter()
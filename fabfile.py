@@ -13,6 +13,14 @@ def test():
         abort("Aborted at user request.")
 
 
+def bench(baseline=None):
+    # Route benchmarks against the configured (disposable) database.
+    command = "python -m benchmarks run --out bench_results.json"
+    if baseline:
+        command += " --baseline {} --max-regression 10".format(baseline)
+    local(command)
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -0,0 +1,87 @@
+from functools import cached_property, lru_cache
+
+import babel.dates
+import dateutil.parser
+from babel import Locale
+from babel.dates import UTC, parse_pattern
+
+
+# ----------------------------------------------------------------------------#
+# Date and time formatting.
+# ----------------------------------------------------------------------------#
+
+# Format names accepted by the datetime filter, as Babel patterns.
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+# Babel's own named formats, for the names not defined above.
+BABEL_FORMATS = ('full', 'long', 'medium', 'short')
+
+
+class DateTimeFormatter:
+    """
+        Formats datetimes, or strings parsed as datetimes, with the patterns
+        of DATETIME_FORMATS compiled once. Results are kept in an LRU cache
+        keyed on (value, format), since a page shows the same few start
+        times over and over.
+
+        Any other format is taken as a Babel pattern, and compiled on first
+        use. Naive datetimes are taken as UTC, as Babel does.
+    """
+
+    def __init__(self, formats=DATETIME_FORMATS, locale='en',
+                 cache_size=4096):
+        self.locale_name = locale
+        self.patterns = {name: parse_pattern(pattern)
+                         for name, pattern in formats.items()}
+        self.cached_format = lru_cache(maxsize=cache_size)(self.format_value)
+
+    @cached_property
+    def locale(self):
+        # Loaded on first use, or by the warm-up, rather than at import.
+        return Locale.parse(self.locale_name)
+
+    def format_value(self, value, format):
+        if isinstance(value, str):
+            value = dateutil.parser.parse(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=UTC)
+
+        pattern = self.patterns.get(format)
+        if pattern is None:
+            if format in BABEL_FORMATS:
+                return babel.dates.format_datetime(value, format,
+                                                   locale=self.locale)
+            pattern = self.patterns[format] = parse_pattern(format)
+        return pattern.apply(value, self.locale)
+
+    def format(self, value, format='medium'):
+        if value is None:
+            return ''
+        return self.cached_format(value, format)
+
+    def format_many(self, values, format='medium'):
+        # Formats a sequence of values with one format, as a list.
+        cached_format = self.cached_format
+        return [cached_format(value, format) if value is not None else ''
+                for value in values]
+
+    def cache_info(self):
+        return self.cached_format.cache_info()
+
+    def cache_clear(self):
+        self.cached_format.cache_clear()
+
+
+datetime_formatter = DateTimeFormatter()
+
+
+def add_start_time_text(shows, format='full'):
+    # Sets 'start_time_text' on a page of show dictionaries in one call.
+    texts = datetime_formatter.format_many(
+        [show["start_time"] for show in shows], format)
+    for show, text in zip(shows, texts):
+        show["start_time_text"] = text
+    return shows
@@ -0,0 +1,32 @@
+# Gunicorn settings, picked up from the working directory:
+#
+#     gunicorn 'app:create_app()'
+#
+# The app is built once in the master process and forked into the workers,
+# which then start serving without importing anything.
+
+import os
+
+bind = '0.0.0.0:%s' % os.environ.get('PORT', '5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('WORKER_THREADS', 1))
+preload_app = True
+
+
+def when_ready(server):
+    # Compiled templates and locale data are inherited by every worker.
+    from warmup import SHARED_STEPS, warmup
+    warmup.run(server.app.wsgi(), SHARED_STEPS)
+
+
+def post_fork(server, worker):
+    # Connections inherited from the master are dropped, so that no two
+    # processes ever talk over the same socket.
+    from models import dispose_engines
+    dispose_engines(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    # Runs before the worker accepts its first request.
+    from warmup import WORKER_STEPS, warmup
+    warmup.run(worker.wsgi, WORKER_STEPS)
@@ -0,0 +1,487 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+import click
+from sqlalchemy.exc import DBAPIError
+from wtforms.fields import BooleanField, DateTimeField, SelectField, \
+    SelectMultipleField
+from wtforms.validators import StopValidation, ValidationError
+
+from counters import recount
+from forms import ArtistForm, ShowForm, VenueForm
+from models import Artist, ImportCheckpoint, Show, Venue, db
+from summaries import refresh as refresh_summaries
+
+
+# ----------------------------------------------------------------------------#
+# Reading.
+# ----------------------------------------------------------------------------#
+
+FORMATS = ('csv', 'ndjson')
+
+
+def guess_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def read_rows(path, format):
+    """
+        Yields the records of a CSV file with a header line, or of a file
+        with one JSON object per line, as dictionaries.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        if format == 'csv':
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# ----------------------------------------------------------------------------#
+# Validation.
+# ----------------------------------------------------------------------------#
+
+# Accepted, in any case, as false by boolean columns: BooleanField's false
+# values, and the usual spellings found in spreadsheets.
+FALSE_VALUES = ('false', '', '0', 'no', 'n', 'f', 'off')
+
+
+class RowField:
+    """
+        The part of a WTForms field that validators use, so that the form's
+        own validators can check a plain value without building a form.
+    """
+    __slots__ = ('data', 'raw_data', 'errors')
+
+    def __init__(self, data):
+        self.data = data
+        self.raw_data = [data]
+        self.errors = []
+
+    def gettext(self, string):
+        return string
+
+    def ngettext(self, singular, plural, n):
+        return singular if n == 1 else plural
+
+
+class FieldRule:
+    """
+        Converts the raw value of one column the way the form field would
+        from form data, then runs the field's validators on it.
+    """
+
+    def __init__(self, name, unbound_field, integer=False):
+        self.name = name
+        self.integer = integer
+        self.field_class = unbound_field.field_class if unbound_field else None
+        kwargs = unbound_field.kwargs if unbound_field else {}
+        self.validators = kwargs.get('validators', ())
+        self.default = kwargs.get('default')
+
+        choices = kwargs.get('choices') or ()
+        if callable(choices):
+            choices = choices()
+        # Choice values, also accepted by their labels.
+        self.choices = {label: value for value, label in choices}
+        self.choices.update((value, value) for value, label in choices)
+
+        formats = kwargs.get('format', '%Y-%m-%d %H:%M:%S')
+        self.formats = [formats] if isinstance(formats, str) else formats
+
+    def convert(self, value):
+        if self.field_class is None or self.integer:
+            if value is None or value == '':
+                return None
+            if isinstance(value, bool):
+                raise ValueError('Not a valid integer value.')
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                raise ValueError('Not a valid integer value.') from None
+
+        if issubclass(self.field_class, BooleanField):
+            if value is None:
+                return bool(self.default)
+            if isinstance(value, bool):
+                return value
+            return str(value).strip().lower() not in FALSE_VALUES
+
+        if issubclass(self.field_class, DateTimeField):
+            if value is None or value == '':
+                return None
+            if isinstance(value, datetime):
+                return value
+            for format in self.formats:
+                try:
+                    return datetime.strptime(value, format)
+                except ValueError:
+                    pass
+            try:
+                return datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ValueError('Not a valid datetime value.') from None
+
+        if issubclass(self.field_class, SelectMultipleField):
+            if value is None:
+                values = []
+            elif isinstance(value, str):
+                values = [item.strip() for item in value.split(',')
+                          if item.strip()]
+            else:
+                values = [str(item) for item in value]
+            for item in values:
+                if item not in self.choices:
+                    raise ValueError(
+                        "'%s' is not a valid choice for this field." % item)
+            return [self.choices[item] for item in values]
+
+        value = '' if value is None else str(value)
+        if issubclass(self.field_class, SelectField) and value:
+            if value not in self.choices:
+                raise ValueError('Not a valid choice.')
+            return self.choices[value]
+        return value
+
+    def clean(self, value):
+        # The converted value; ValueError with the messages when invalid.
+        data = self.convert(value)
+        field = RowField(data)
+        for validator in self.validators:
+            try:
+                validator(None, field)
+            except StopValidation as error:
+                if error.args and error.args[0]:
+                    field.errors.append(error.args[0])
+                break
+            except ValidationError as error:
+                field.errors.append(error.args[0])
+        if field.errors:
+            raise ValueError(*field.errors)
+        return data
+
+
+class RowSchema:
+    """
+        Validation rules for the records of one model, taken from its form:
+        the columns of the model's table that the form has, and the id,
+        which is optional. Integer columns the form takes as text, such as
+        a show's venue_id, are checked as integers.
+    """
+
+    def __init__(self, model, form_class):
+        self.model = model
+        self.table = model.__table__
+        self.rules = []
+        for column in self.table.columns:
+            unbound_field = getattr(form_class, column.name, None)
+            if unbound_field is None and column.name != 'id':
+                continue
+            self.rules.append(FieldRule(
+                column.name, unbound_field,
+                integer=isinstance(column.type, db.Integer)))
+
+    def clean(self, record):
+        """
+            Returns (values, errors): the column values of a record, and a
+            dictionary of error messages by column.
+        """
+        values = {}
+        errors = {}
+        for rule in self.rules:
+            try:
+                values[rule.name] = rule.clean(record.get(rule.name))
+            except ValueError as error:
+                errors[rule.name] = [str(message) for message in error.args]
+        # The id is only loaded when the record has one.
+        if values.get('id') is None:
+            values.pop('id', None)
+        return values, errors
+
+
+# ----------------------------------------------------------------------------#
+# Loading.
+# ----------------------------------------------------------------------------#
+
+def copy_value(value):
+    # One value in the Postgres COPY text format.
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, list):
+        value = '{%s}' % ','.join(
+            '"%s"' % str(item).replace('\\', '\\\\').replace('"', '\\"')
+            for item in value)
+    else:
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(connection, table, columns, rows):
+    """
+        Loads rows into a Postgres table with COPY FROM STDIN, over the
+        connection and in the transaction of the session.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(copy_value(row[name]) for name in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    preparer = connection.dialect.identifier_preparer
+    statement = 'COPY %s (%s) FROM STDIN' % (
+        preparer.format_table(table),
+        ', '.join(preparer.quote(name) for name in columns))
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+
+class Importer:
+    """
+        Bulk loads venues, artists or shows from CSV or NDJSON files, with
+        `flask import`. Records are checked against the rules of the
+        matching form, then inserted IMPORT_BATCH_SIZE at a time, with COPY
+        on Postgres and executemany elsewhere, one transaction per batch.
+
+        Invalid records are written, with their errors, to an NDJSON error
+        file. The number of records read, and the length of the error file,
+        are saved in an ImportCheckpoint in each batch's transaction, so an
+        interrupted import resumes where its last batch ended.
+    """
+
+    SCHEMAS = {
+        'venues': (Venue, VenueForm),
+        'artists': (Artist, ArtistForm),
+        'shows': (Show, ShowForm),
+    }
+
+    def __init__(self, app=None):
+        self.batch_size = 5000
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.batch_size = app.config.get('IMPORT_BATCH_SIZE', 5000)
+
+        @app.cli.command('import')
+        @click.argument('kind', type=click.Choice(list(self.SCHEMAS)))
+        @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+        @click.option('--format', type=click.Choice(FORMATS),
+                      help='Input format; guessed from the file name.')
+        @click.option('--batch-size', type=int,
+                      help='Records per transaction; IMPORT_BATCH_SIZE.')
+        @click.option('--errors', 'errors_path', type=click.Path(),
+                      help='Error file; PATH.errors.ndjson by default.')
+        @click.option('--restart', is_flag=True,
+                      help='Start from the first record, ignoring the '
+                           'progress of an earlier run.')
+        def import_command(kind, path, format, batch_size, errors_path,
+                           restart):
+            """Load venues, artists or shows from a CSV or NDJSON file."""
+            result = self.run(kind, path, format or guess_format(path),
+                              batch_size or self.batch_size,
+                              errors_path or path + '.errors.ndjson',
+                              restart)
+            click.echo('%s: %d loaded, %d rejected (%s), %.1f s' % (
+                kind, result["loaded"], result["rejected"],
+                result["errors_path"], result["seconds"]))
+
+    def run(self, kind, path, format, batch_size, errors_path,
+            restart=False):
+        model, form_class = self.SCHEMAS[kind]
+        schema = RowSchema(model, form_class)
+        source = '%s:%s' % (kind, os.path.abspath(path))
+        file_size = os.path.getsize(path)
+
+        checkpoint = db.session.get(ImportCheckpoint, source)
+        if checkpoint is not None and not restart \
+                and checkpoint.file_size != file_size:
+            raise click.ClickException(
+                '%s changed since the import was interrupted; use --restart '
+                'to import it from the start.' % path)
+        if checkpoint is None or restart:
+            checkpoint = db.session.merge(ImportCheckpoint(
+                source=source, rows=0, error_bytes=0, file_size=file_size))
+            db.session.commit()
+        elif checkpoint.rows:
+            click.echo('Resuming after record %d.' % checkpoint.rows)
+
+        # Error lines written after the last commit are dropped.
+        errors_file = open(errors_path, 'ab+')
+        errors_file.truncate(checkpoint.error_bytes)
+        errors_file.seek(checkpoint.error_bytes)
+
+        records = islice(read_rows(path, format), checkpoint.rows, None)
+        number = first = checkpoint.rows
+        loaded = rejected = 0
+        loaded_ids = False
+        started_at = time.perf_counter()
+        with errors_file:
+            while True:
+                batch = []
+                try:
+                    for record in islice(records, batch_size):
+                        number += 1
+                        batch.append((number, record))
+                except (ValueError, csv.Error) as error:
+                    raise click.ClickException(
+                        'Record %d of %s cannot be read: %s'
+                        % (number + 1, path, error))
+                if not batch:
+                    break
+
+                rows, errors = self.clean_batch(schema, batch)
+                failed = self.load_batch(schema, rows)
+                if schema.model is Show and rows:
+                    self.count_shows(rows)
+                for record_number, record, messages in errors + failed:
+                    errors_file.write(json.dumps(
+                        {"record": record_number, "errors": messages,
+                         "data": record}, default=str).encode() + b'\n')
+                errors_file.flush()
+
+                checkpoint.rows = number
+                checkpoint.error_bytes = errors_file.tell()
+                checkpoint.updated_at = datetime.now(timezone.utc)
+                db.session.commit()
+
+                loaded += len(rows) - len(failed)
+                rejected += len(errors) + len(failed)
+                loaded_ids = loaded_ids or any('id' in row for _, _, row in rows)
+                # On stderr, so that it stays out of redirected output.
+                click.echo('\r%s: %d records (%.0f records/s)' % (
+                    kind, number,
+                    (number - first) / (time.perf_counter() - started_at)),
+                    nl=False, err=True)
+        click.echo(err=True)
+
+        if loaded_ids:
+            self.reset_sequence(schema.table)
+        db.session.delete(checkpoint)
+        db.session.commit()
+
+        from cache import page_cache
+        from entities import entity_cache
+        page_cache.clear()
+        entity_cache.clear()
+        return {"loaded": loaded, "rejected": rejected,
+                "errors_path": errors_path,
+                "seconds": time.perf_counter() - started_at}
+
+    def clean_batch(self, schema, batch):
+        """
+            Splits a batch of (number, record) pairs into the rows to insert,
+            as (number, record, values), and the rejected records, as
+            (number, record, errors).
+        """
+        rows = []
+        errors = []
+        for number, record in batch:
+            values, messages = schema.clean(record)
+            if messages:
+                errors.append((number, record, messages))
+            else:
+                rows.append((number, record, values))
+
+        if schema.model is Show and rows:
+            # Shows of venues or artists that do not exist are rejected here,
+            # rather than failing the whole batch on the foreign keys.
+            venue_ids = self.existing_ids(Venue, rows, 'venue_id')
+            artist_ids = self.existing_ids(Artist, rows, 'artist_id')
+            checked = []
+            for number, record, values in rows:
+                messages = {}
+                if values["venue_id"] not in venue_ids:
+                    messages["venue_id"] = ['No venue with this id.']
+                if values["artist_id"] not in artist_ids:
+                    messages["artist_id"] = ['No artist with this id.']
+                if messages:
+                    errors.append((number, record, messages))
+                else:
+                    checked.append((number, record, values))
+            rows = checked
+        return rows, sorted(errors, key=lambda error: error[0])
+
+    @staticmethod
+    def count_shows(rows):
+        # The counters and summaries of the batch's venues and artists,
+        # refreshed in its transaction.
+        venue_ids = {values["venue_id"] for _, _, values in rows}
+        artist_ids = {values["artist_id"] for _, _, values in rows}
+        recount(Venue, venue_ids)
+        recount(Artist, artist_ids)
+        refresh_summaries('venue', venue_ids)
+        refresh_summaries('artist', artist_ids)
+
+    @staticmethod
+    def existing_ids(model, rows, name):
+        ids = {values[name] for _, _, values in rows} - {None}
+        return {row.id for row in
+                db.session.query(model.id).filter(model.id.in_(ids))}
+
+    def load_batch(self, schema, rows):
+        """
+            Inserts a batch of rows in the current transaction. When the
+            database refuses the batch, its rows are inserted one by one,
+            and those refused are returned as (number, record, errors).
+        """
+        if not rows:
+            return []
+        try:
+            with db.session.begin_nested():
+                self.insert_rows(schema, [values for _, _, values in rows])
+            return []
+        except DBAPIError:
+            pass
+
+        failed = []
+        for number, record, values in rows:
+            try:
+                with db.session.begin_nested():
+                    self.insert_rows(schema, [values])
+            except DBAPIError as error:
+                failed.append((number, record,
+                               {"_database": [str(error.orig)]}))
+        return failed
+
+    @staticmethod
+    def insert_rows(schema, rows):
+        connection = db.session.connection()
+        # Rows with and without an id are inserted separately, since a
+        # statement inserts the same columns in every row.
+        for has_id in (True, False):
+            group = [row for row in rows if ('id' in row) == has_id]
+            if not group:
+                continue
+            if connection.dialect.name == 'postgresql':
+                copy_rows(connection, schema.table, list(group[0]), group)
+            else:
+                connection.execute(schema.table.insert(), group)
+
+    @staticmethod
+    def reset_sequence(table):
+        # Ids given in the file leave the Postgres id sequence behind.
+        connection = db.session.connection()
+        if connection.dialect.name == 'postgresql':
+            connection.execute(db.text(
+                "SELECT setval(pg_get_serial_sequence(:table, 'id'), "
+                "(SELECT max(id) FROM %s))"
+                % connection.dialect.identifier_preparer.format_table(
+                    table)), {"table": table.name})
+            db.session.commit()
+
+
+importer = Importer()
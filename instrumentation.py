@@ -0,0 +1,231 @@
+import heapq
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+sql_logger = logging.getLogger('fyyur.sql')
+pool_logger = logging.getLogger('fyyur.pool')
+
+
+# ----------------------------------------------------------------------------#
+# Per-request statement statistics.
+# ----------------------------------------------------------------------------#
+
+# Runs of bound parameters, as in an expanded IN list, collapse into one.
+PARAMETER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)')
+NUMBER = re.compile(r'\b\d+\b')
+WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    # Normalizes a statement so that repeats with other parameters match.
+    shape = WHITESPACE.sub(' ', statement).strip()
+    shape = PARAMETER_LIST.sub('(?)', shape)
+    return NUMBER.sub('?', shape)
+
+
+class RequestQueryStats:
+    """
+        Statement count, total database time, slowest statements and
+        repeated statement shapes of a single request.
+    """
+
+    def __init__(self, slowest_limit):
+        self.started_at = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_limit = slowest_limit
+        self.slowest = []  # Min-heap of (duration, statement).
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+        if len(self.slowest) < self.slowest_limit:
+            heapq.heappush(self.slowest, (duration, statement))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, statement))
+
+    def slowest_statements(self):
+        return sorted(self.slowest, reverse=True)
+
+    def repeated_shapes(self, threshold):
+        # Shapes run at least `threshold` times: likely N+1 query patterns.
+        return [(shape, count) for shape, count in self.shapes.most_common()
+                if count >= threshold]
+
+
+def current_stats():
+    # Statistics of the request being served, or None outside of one.
+    if has_request_context():
+        return g.get('sql_stats')
+    return None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    started_at = conn.info['query_started_at'].pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started_at)
+
+
+# ----------------------------------------------------------------------------#
+# Flask integration.
+# ----------------------------------------------------------------------------#
+
+class SQLInstrumentation:
+    """
+        Records the statements each request issues through SQLAlchemy engine
+        events. Results go out as a Server-Timing response header and as one
+        JSON line per request on the 'fyyur.sql' logger. Streamed responses
+        run most of their statements while the body is sent, after the
+        headers: they are logged once sent in full, without Server-Timing. With
+        SQL_INSTRUMENTATION and METRICS_ENABLED both off nothing is
+        registered at all.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.recording = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Statements are also recorded, without being reported, when the
+        # metrics endpoint needs the per-request database time.
+        self.enabled = app.config.get('SQL_INSTRUMENTATION', False)
+        self.recording = self.enabled or app.config.get('METRICS_ENABLED',
+                                                        False)
+        if not self.recording:
+            return
+
+        self.slowest_limit = app.config.get('SQL_SLOWEST_STATEMENTS', 3)
+        self.n_plus_one_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD',
+                                                   5)
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+        app.before_request(self.start_request)
+        if self.enabled:
+            app.after_request(self.finish_request)
+
+    def start_request(self):
+        g.sql_stats = RequestQueryStats(self.slowest_limit)
+
+    def finish_request(self, response):
+        stats = g.get('sql_stats')
+        if stats is None:
+            return response
+
+        request_info = (request.endpoint, request.method, request.path,
+                        response.status_code)
+        if response.is_streamed:
+            response.call_on_close(lambda: self.report(stats, *request_info))
+        else:
+            response.headers.add('Server-Timing',
+                                 self.report(stats, *request_info))
+        return response
+
+    def report(self, stats, endpoint, method, path, status):
+        # Logs the statements of a finished request, and returns them as a
+        # Server-Timing header value.
+        elapsed = time.perf_counter() - stats.started_at
+        repeated = stats.repeated_shapes(self.n_plus_one_threshold)
+
+        timings = [
+            'db;dur=%.2f;desc="%d statements"' % (stats.duration * 1000,
+                                                  stats.count),
+            'app;dur=%.2f' % (elapsed * 1000),
+        ]
+        if repeated:
+            timings.append('n-plus-one;desc="%d repeated statements"'
+                           % len(repeated))
+
+        record = {
+            "endpoint": endpoint, "method": method, "path": path,
+            "status": status, "statements": stats.count,
+            "db_ms": round(stats.duration * 1000, 2),
+            "request_ms": round(elapsed * 1000, 2),
+            "slowest": [{"ms": round(duration * 1000, 2),
+                         "statement": statement}
+                        for duration, statement in stats.slowest_statements()],
+            "n_plus_one": [{"statement": shape, "count": count}
+                           for shape, count in repeated],
+        }
+        # Requests with repeated statements are logged as warnings.
+        sql_logger.log(logging.WARNING if repeated else logging.INFO,
+                       json.dumps(record))
+        return ', '.join(timings)
+
+
+sql_instrumentation = SQLInstrumentation()
+
+
+# ----------------------------------------------------------------------------#
+# Connection pool health.
+# ----------------------------------------------------------------------------#
+
+class PoolMonitor:
+    """
+        Logs connection pool trouble on the 'fyyur.pool' logger: a warning,
+        at most once a minute, when a pool is DB_POOL_WARN_RATIO full, and
+        every connection invalidated after a failed pre-ping or a database
+        error.
+    """
+
+    warn_interval = 60  # Seconds between two "pool nearly full" warnings.
+
+    def __init__(self):
+        self.warn_ratio = 0.8
+        self.warned_at = {}
+
+    def init_app(self, app, engine):
+        self.warn_ratio = app.config.get('DB_POOL_WARN_RATIO', 0.8)
+        max_overflow = app.config['SQLALCHEMY_ENGINE_OPTIONS'].get(
+            'max_overflow', 0)
+        self.watch(engine, max_overflow)
+
+    def watch(self, engine, max_overflow=0):
+        pool = engine.pool
+        if not hasattr(pool, 'checkedout'):
+            return  # Not a queue-based pool, as with SQLite.
+
+        capacity = pool.size() + max(max_overflow, 0)
+        name = repr(engine.url)
+
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            checked_out = pool.checkedout()
+            if checked_out < capacity * self.warn_ratio:
+                return
+            now = time.monotonic()
+            if now - self.warned_at.get(name, 0) < self.warn_interval:
+                return
+            self.warned_at[name] = now
+            pool_logger.warning('Connection pool for %s nearly exhausted: '
+                                '%d of %d connections in use. %s', name,
+                                checked_out, capacity, pool.status())
+
+        def invalidate(dbapi_connection, connection_record, exception):
+            pool_logger.warning('Connection to %s invalidated: %s', name,
+                                exception)
+
+        event.listen(pool, 'checkout', checkout)
+        event.listen(pool, 'invalidate', invalidate)
+        pool_logger.info('Connection pool for %s: %s', name, pool.status())
+
+
+pool_monitor = PoolMonitor()
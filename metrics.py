@@ -0,0 +1,381 @@
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import Response, current_app, g, request
+from jinja2 import Template
+
+from cache import page_cache
+from instrumentation import current_stats
+from models import db
+
+
+# ----------------------------------------------------------------------------#
+# In-process aggregation.
+# ----------------------------------------------------------------------------#
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+class Shard:
+    # Samples recorded by one thread; only that thread ever writes to it.
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+
+class MetricsRegistry:
+    """
+        Counters and histograms aggregated per thread, so that recording a
+        sample takes no lock. A scrape sums the shards of all threads.
+    """
+
+    def __init__(self):
+        self.definitions = {}  # name -> (type, help, buckets)
+        self.shards = []
+        self.shards_lock = threading.Lock()
+        self.local = threading.local()
+
+    def counter(self, name, help_text):
+        self.definitions[name] = ('counter', help_text, None)
+
+    def gauge(self, name, help_text):
+        self.definitions[name] = ('gauge', help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.definitions[name] = ('histogram', help_text, tuple(buckets))
+
+    def shard(self):
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = self.local.shard = Shard()
+            with self.shards_lock:
+                self.shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=(), amount=1):
+        counters = self.shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        histograms = self.shard().histograms
+        key = (name, labels)
+        buckets = self.definitions[name][2]
+        samples = histograms.get(key)
+        if samples is None:
+            samples = histograms[key] = [0] * (len(buckets) + 3)
+        samples[bisect.bisect_left(buckets, value)] += 1
+        samples[-2] += value
+        samples[-1] += 1
+
+    def snapshot(self):
+        """
+            Sums all shards into a dictionary of counters and histograms,
+            as lists of [name, labels, value] that survive a JSON round trip.
+        """
+        counters = {}
+        histograms = {}
+        with self.shards_lock:
+            shards = list(self.shards)
+        for shard in shards:
+            # dict.copy() is atomic, so the owning thread may keep writing.
+            for key, value in shard.counters.copy().items():
+                counters[key] = counters.get(key, 0) + value
+            for key, samples in shard.histograms.copy().items():
+                total = histograms.setdefault(key, [0] * len(samples))
+                for index, value in enumerate(samples):
+                    total[index] += value
+
+        return {
+            "counters": [[name, list(labels), value]
+                         for (name, labels), value in counters.items()],
+            "histograms": [[name, list(labels), samples]
+                           for (name, labels), samples in histograms.items()],
+        }
+
+
+# ----------------------------------------------------------------------------#
+# Multi-process snapshots.
+# ----------------------------------------------------------------------------#
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(snapshots):
+    """
+        Merges per-process snapshots. Counters and histograms of exited
+        processes still count; their gauges are dropped.
+    """
+    counters = {}
+    histograms = {}
+    gauges = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, samples in snapshot["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(samples))
+            for index, value in enumerate(samples):
+                total[index] += value
+        if snapshot.get("pid") is None or process_alive(snapshot["pid"]):
+            for name, labels, value in snapshot["gauges"]:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+    return counters, histograms, gauges
+
+
+# ----------------------------------------------------------------------------#
+# Prometheus text format.
+# ----------------------------------------------------------------------------#
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (key, str(value).replace('\\', '\\\\')
+                     .replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs)
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return '%d' % value
+    return repr(value)
+
+
+def exposition(definitions, counters, histograms, gauges):
+    lines = []
+    for name, (metric_type, help_text, buckets) in sorted(definitions.items()):
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, metric_type))
+
+        if metric_type == 'histogram':
+            for (sample_name, labels), samples in sorted(histograms.items()):
+                if sample_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, samples):
+                    cumulative += count
+                    lines.append('%s_bucket%s %d' % (name, format_labels(
+                        labels, [('le', repr(bound))]), cumulative))
+                lines.append('%s_bucket%s %d' % (name, format_labels(
+                    labels, [('le', '+Inf')]), samples[-1]))
+                lines.append('%s_sum%s %s' % (name, format_labels(labels),
+                                              format_value(samples[-2])))
+                lines.append('%s_count%s %d' % (name, format_labels(labels),
+                                                samples[-1]))
+        else:
+            samples = counters if metric_type == 'counter' else gauges
+            for (sample_name, labels), value in sorted(samples.items()):
+                if sample_name == name:
+                    lines.append('%s%s %s' % (name, format_labels(labels),
+                                              format_value(value)))
+    return '\n'.join(lines) + '\n'
+
+
+# ----------------------------------------------------------------------------#
+# Flask integration.
+# ----------------------------------------------------------------------------#
+
+class TimedTemplate(Template):
+    # Records how long each top-level template render takes, streamed ones
+    # included.
+
+    def render(self, *args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            self.observe(time.perf_counter() - started_at)
+
+    def generate(self, *args, **kwargs):
+        # Timed until the output is exhausted or closed, counting only the
+        # time spent producing it: the time the response waits on the
+        # client between chunks is left out.
+        elapsed = 0.0
+        chunks = super().generate(*args, **kwargs)
+        try:
+            while True:
+                started_at = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started_at
+                yield chunk
+        finally:
+            chunks.close()
+            self.observe(elapsed)
+
+    def observe(self, seconds):
+        metrics.registry.observe('fyyur_template_render_seconds', seconds,
+                                 (('template', self.name),))
+
+
+class Metrics:
+    """
+        Request, database, connection pool, template and page cache metrics,
+        served in Prometheus text format at /metrics.
+
+        Under gunicorn, set METRICS_MULTIPROC_DIR to a directory shared by
+        the workers. Each worker then writes its totals there at most every
+        METRICS_FLUSH_INTERVAL seconds, and a scrape on any worker merges the
+        totals of all of them.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.registry = MetricsRegistry()
+        self.registry.counter('fyyur_http_requests_total',
+                              'Requests served, by endpoint, method and status.')
+        self.registry.histogram('fyyur_http_request_duration_seconds',
+                                'Request latency, by endpoint.')
+        self.registry.histogram('fyyur_db_duration_seconds',
+                                'Database time per request, by endpoint.')
+        self.registry.counter('fyyur_db_statements_total',
+                              'SQL statements issued, by endpoint.')
+        self.registry.histogram('fyyur_template_render_seconds',
+                                'Template render time, by template.')
+        self.registry.gauge('fyyur_db_pool_size',
+                            'Connections kept open by the pool.')
+        self.registry.gauge('fyyur_db_pool_checked_out',
+                            'Pool connections currently in use.')
+        self.registry.gauge('fyyur_db_pool_overflow',
+                            'Connections open beyond the pool size.')
+        self.registry.counter('fyyur_page_cache_hits_total',
+                              'Page and fragment cache hits.')
+        self.registry.counter('fyyur_page_cache_misses_total',
+                              'Page and fragment cache misses.')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', False)
+        if not self.enabled:
+            return
+
+        self.multiproc_dir = app.config.get('METRICS_MULTIPROC_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        self.flushed_at = 0.0
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def start_request(self):
+        g.metrics_started_at = time.perf_counter()
+
+    def finish_request(self, response):
+        started_at = g.get('metrics_started_at')
+        if started_at is None:
+            return response
+
+        request_info = (started_at, request.endpoint or 'unmatched',
+                        request.method, response.status_code, current_stats())
+        # Streamed bodies run their queries while they are sent, so their
+        # requests are recorded once sent in full, in an app context of
+        # their own: the request's is gone by then.
+        if response.is_streamed:
+            app = current_app._get_current_object()
+
+            def record_streamed():
+                with app.app_context():
+                    self.record(*request_info)
+
+            response.call_on_close(record_streamed)
+        else:
+            self.record(*request_info)
+        return response
+
+    def record(self, started_at, endpoint, method, status, stats):
+        labels = (('endpoint', endpoint),)
+        self.registry.inc('fyyur_http_requests_total',
+                          (('endpoint', endpoint), ('method', method),
+                           ('status', str(status))))
+        self.registry.observe('fyyur_http_request_duration_seconds',
+                              time.perf_counter() - started_at, labels)
+
+        if stats is not None:
+            self.registry.observe('fyyur_db_duration_seconds',
+                                  stats.duration, labels)
+            self.registry.inc('fyyur_db_statements_total', labels,
+                              stats.count)
+
+        if self.multiproc_dir and \
+                time.monotonic() - self.flushed_at > self.flush_interval:
+            self.flush()
+
+    def process_snapshot(self):
+        # This process's totals, plus the values sampled at snapshot time.
+        snapshot = self.registry.snapshot()
+        snapshot["pid"] = os.getpid()
+        snapshot["gauges"] = []
+
+        pool = db.engine.pool
+        for name, method in (('fyyur_db_pool_size', 'size'),
+                             ('fyyur_db_pool_checked_out', 'checkedout'),
+                             ('fyyur_db_pool_overflow', 'overflow')):
+            # Only queue-based pools keep these counts.
+            if hasattr(pool, method):
+                snapshot["gauges"].append([name, [], getattr(pool, method)()])
+
+        cache_stats = page_cache.stats()
+        snapshot["counters"].append(
+            ['fyyur_page_cache_hits_total', [], cache_stats["hits"]])
+        snapshot["counters"].append(
+            ['fyyur_page_cache_misses_total', [], cache_stats["misses"]])
+        return snapshot
+
+    def flush(self):
+        # Atomically replaces this process's snapshot file.
+        self.flushed_at = time.monotonic()
+        fd, temp_path = tempfile.mkstemp(dir=self.multiproc_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as snapshot_file:
+            json.dump(self.process_snapshot(), snapshot_file)
+        os.replace(temp_path, os.path.join(self.multiproc_dir,
+                                           'metrics-%d.json' % os.getpid()))
+
+    def collect(self):
+        if not self.multiproc_dir:
+            return merge_snapshots([self.process_snapshot()])
+
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiproc_dir,
+                                           'metrics-*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue
+        return merge_snapshots(snapshots)
+
+    def metrics_view(self):
+        counters, histograms, gauges = self.collect()
+        return Response(exposition(self.registry.definitions, counters,
+                                   histograms, gauges),
+                        mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
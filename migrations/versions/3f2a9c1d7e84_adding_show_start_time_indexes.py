@@ -0,0 +1,35 @@
+"""Adding composite start_time indexes to the show table.
+
+Revision ID: 3f2a9c1d7e84
+Revises: fbca4e247f07
+Create Date: 2026-10-18 09:12:40.118532
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7e84'
+down_revision = 'fbca4e247f07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built concurrently, outside of the migration transaction, so that the
+    # show table stays writable while its historical rows are indexed.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_venue_id_start_time', 'show',
+                        ['venue_id', 'start_time'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_show_artist_id_start_time', 'show',
+                        ['artist_id', 'start_time'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_show_artist_id_start_time', table_name='show',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_show_venue_id_start_time', table_name='show',
+                      postgresql_concurrently=True)
@@ -0,0 +1,32 @@
+"""Adding the import_checkpoint table used by flask import.
+
+Revision ID: 4e8a1c6f2d90
+Revises: 5b9e2d4c8f13
+Create Date: 2026-10-18 15:02:11.437920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8a1c6f2d90'
+down_revision = '5b9e2d4c8f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'import_checkpoint',
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('error_bytes', sa.BigInteger(), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade():
+    op.drop_table('import_checkpoint')
@@ -0,0 +1,32 @@
+"""Adding the (name, id) indexes used by the artists listing.
+
+Revision ID: 5b9e2d4c8f13
+Revises: e4b7d1a9c362
+Create Date: 2026-10-18 14:12:40.118503
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9e2d4c8f13'
+down_revision = 'e4b7d1a9c362'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_artist_name_id', 'artist', ['name', 'id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_artist_state_city_name_id', 'artist',
+                        ['state', 'city', 'name', 'id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_state_city_name_id', table_name='artist',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_artist_name_id', table_name='artist',
+                      postgresql_concurrently=True)
@@ -0,0 +1,47 @@
+"""Adding created_at and updated_at to venues, artists and shows.
+
+Existing rows get the time of the migration for both.
+
+Revision ID: 7c2e9f4a1b38
+Revises: d3f6b8a2c571
+Create Date: 2026-10-18 19:02:45.118306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9f4a1b38'
+down_revision = 'd3f6b8a2c571'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite cannot add a column with a non-constant default to a table
+    # holding rows, so there the tables are copied into new ones instead.
+    recreate = 'always' if op.get_bind().dialect.name == 'sqlite' else 'auto'
+    for table in ('venue', 'artist', 'show'):
+        with op.batch_alter_table(table, recreate=recreate) as batch_op:
+            for column in ('created_at', 'updated_at'):
+                batch_op.add_column(sa.Column(
+                    column, sa.DateTime(timezone=True),
+                    server_default=sa.func.now(), nullable=False))
+
+    with op.get_context().autocommit_block():
+        for table in ('venue', 'artist', 'show'):
+            op.create_index('ix_%s_updated_at' % table, table, ['updated_at'],
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('show', 'artist', 'venue'):
+            op.drop_index('ix_%s_updated_at' % table, table_name=table,
+                          postgresql_concurrently=True)
+
+    for table in ('show', 'artist', 'venue'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('created_at')
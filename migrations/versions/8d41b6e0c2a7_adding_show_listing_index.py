@@ -0,0 +1,27 @@
+"""Adding the (start_time, id) index used by the shows listing.
+
+Revision ID: 8d41b6e0c2a7
+Revises: 3f2a9c1d7e84
+Create Date: 2026-10-18 10:03:16.524907
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b6e0c2a7'
+down_revision = '3f2a9c1d7e84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_show_start_time_id', table_name='show',
+                      postgresql_concurrently=True)
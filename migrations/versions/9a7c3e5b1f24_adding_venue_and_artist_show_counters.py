@@ -0,0 +1,46 @@
+"""Adding show counters to venues and artists.
+
+The counters start at zero; `flask recount` fills them in.
+
+Revision ID: 9a7c3e5b1f24
+Revises: 4e8a1c6f2d90
+Create Date: 2026-10-18 16:20:37.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a7c3e5b1f24'
+down_revision = '4e8a1c6f2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('num_upcoming_shows', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('num_past_shows', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_time',
+                                       sa.DateTime(timezone=True),
+                                       nullable=True))
+
+    with op.get_context().autocommit_block():
+        for table in ('venue', 'artist'):
+            op.create_index('ix_%s_next_show_time' % table, table,
+                            ['next_show_time'], postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('artist', 'venue'):
+            op.drop_index('ix_%s_next_show_time' % table, table_name=table,
+                          postgresql_concurrently=True)
+
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'next_show_time')
+        op.drop_column(table, 'num_past_shows')
+        op.drop_column(table, 'num_upcoming_shows')
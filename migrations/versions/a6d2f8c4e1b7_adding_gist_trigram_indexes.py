@@ -0,0 +1,47 @@
+"""Adding GiST trigram indexes for nearest-neighbour name search.
+
+The GIN trigram indexes find the names matching a search; these let
+Postgres read them in `name <-> term` distance order and stop at the page,
+instead of sorting every match.
+
+Revision ID: a6d2f8c4e1b7
+Revises: 7c2e9f4a1b38
+Create Date: 2026-10-18 21:14:37.562081
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2f8c4e1b7'
+down_revision = '7c2e9f4a1b38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Trigram indexes only exist on Postgres; other backends search in the
+    # simple mode without them.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_name_trgm_gist', 'venue', ['name'],
+                        postgresql_using='gist',
+                        postgresql_ops={'name': 'gist_trgm_ops'},
+                        postgresql_concurrently=True)
+        op.create_index('ix_artist_name_trgm_gist', 'artist', ['name'],
+                        postgresql_using='gist',
+                        postgresql_ops={'name': 'gist_trgm_ops'},
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_name_trgm_gist', table_name='artist',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_venue_name_trgm_gist', table_name='venue',
+                      postgresql_concurrently=True)
@@ -0,0 +1,45 @@
+"""Adding trigram indexes for venue and artist name search.
+
+Revision ID: c7e3f19a5b62
+Revises: 8d41b6e0c2a7
+Create Date: 2026-10-18 11:27:05.390214
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e3f19a5b62'
+down_revision = '8d41b6e0c2a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Trigram indexes only exist on Postgres; other backends search in the
+    # simple mode without them.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # GIN trigram indexes serve both ILIKE '%term%' and similarity().
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_name_trgm', 'venue', ['name'],
+                        postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+        op.create_index('ix_artist_name_trgm', 'artist', ['name'],
+                        postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_name_trgm', table_name='artist',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_venue_name_trgm', table_name='venue',
+                      postgresql_concurrently=True)
@@ -0,0 +1,41 @@
+"""Adding the show_summary table of upcoming shows per venue and artist.
+
+The table starts empty; `flask refresh-summaries` fills it in.
+
+Revision ID: d3f6b8a2c571
+Revises: 9a7c3e5b1f24
+Create Date: 2026-10-18 17:41:02.664381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f6b8a2c571'
+down_revision = '9a7c3e5b1f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'show_summary',
+        sa.Column('owner', sa.String(length=10), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('show_id', sa.Integer(), nullable=False),
+        sa.Column('other_id', sa.Integer(), nullable=False),
+        sa.Column('other_name', sa.String(), nullable=True),
+        sa.Column('other_image_link', sa.String(length=500), nullable=True),
+        sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('owner', 'owner_id', 'rank')
+    )
+    op.create_index('ix_show_summary_owner_other_id', 'show_summary',
+                    ['owner', 'other_id'])
+
+
+def downgrade():
+    op.drop_index('ix_show_summary_owner_other_id',
+                  table_name='show_summary')
+    op.drop_table('show_summary')
@@ -0,0 +1,104 @@
+"""Adding the venue, artist and show tables.
+
+The revisions up to fbca4e247f07 altered the quoted "Venue", "Artist" and
+"Show" tables, and dropped two of them; the lowercase tables the models use
+were only ever created by db.create_all() on startup, and the revisions
+since then only indexed them. This revision creates them, with those
+indexes, where they do not exist yet; on databases built by create_all() it
+does nothing.
+
+A new database skips the earlier revisions, which cannot run on an empty
+schema: `flask init-db` stamps c7e3f19a5b62 and upgrades from there.
+
+Revision ID: e4b7d1a9c362
+Revises: c7e3f19a5b62
+Create Date: 2026-10-18 06:30:12.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7d1a9c362'
+down_revision = 'c7e3f19a5b62'
+branch_labels = None
+depends_on = None
+
+# An ARRAY on Postgres, and JSON on SQLite, as models.StringList.
+genres_type = sa.JSON().with_variant(postgresql.ARRAY(sa.String()),
+                                     'postgresql')
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+
+    if 'venue' not in existing:
+        op.create_table(
+            'venue',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('state', sa.String(length=120), nullable=True),
+            sa.Column('address', sa.String(length=120), nullable=True),
+            sa.Column('phone', sa.String(length=120), nullable=True),
+            sa.Column('genres', genres_type, nullable=True),
+            sa.Column('image_link', sa.String(length=500), nullable=True),
+            sa.Column('facebook_link', sa.String(length=120), nullable=True),
+            sa.Column('website_link', sa.String(length=120), nullable=True),
+            sa.Column('seeking_talent', sa.Boolean(), nullable=True),
+            sa.Column('seeking_description', sa.String(length=120),
+                      nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'artist' not in existing:
+        op.create_table(
+            'artist',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('state', sa.String(length=120), nullable=True),
+            sa.Column('phone', sa.String(length=120), nullable=True),
+            sa.Column('genres', genres_type, nullable=True),
+            sa.Column('image_link', sa.String(length=500), nullable=True),
+            sa.Column('facebook_link', sa.String(length=120), nullable=True),
+            sa.Column('website_link', sa.String(length=120), nullable=True),
+            sa.Column('seeking_venue', sa.Boolean(), nullable=True),
+            sa.Column('seeking_description', sa.String(length=120),
+                      nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'show' not in existing:
+        op.create_table(
+            'show',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('venue_id', sa.Integer(), nullable=True),
+            sa.Column('artist_id', sa.Integer(), nullable=True),
+            sa.Column('start_time', sa.DateTime(timezone=True),
+                      nullable=False),
+            sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ),
+            sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        # From 3f2a9c1d7e84 and 8d41b6e0c2a7.
+        op.create_index('ix_show_venue_id_start_time', 'show',
+                        ['venue_id', 'start_time'])
+        op.create_index('ix_show_artist_id_start_time', 'show',
+                        ['artist_id', 'start_time'])
+        op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'])
+
+    # From c7e3f19a5b62, on Postgres only.
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in ('venue', 'artist'):
+            if table not in existing:
+                op.create_index('ix_%s_name_trgm' % table, table, ['name'],
+                                postgresql_using='gin',
+                                postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    # The tables may predate this revision, so they are left in place.
+    pass
@@ -1,43 +1,125 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
-from flask import Flask
-from flask_migrate import Migrate
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from flask_wtf import CSRFProtect
+from flask import current_app
+from sqlalchemy.dialects import postgresql
+
+from routing import RoutingSQLAlchemy
 
 
 # ----------------------------------------------------------------------------#
-# App Config.
+# Database.
 # ----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-csrf = CSRFProtect(app)
-csrf.init_app(app)
-moment = Moment(app)
-app.config.from_object('config')
+# Bound to the app by create_app().
+db = RoutingSQLAlchemy()
+
+
+def dispose_engines(app):
+    """
+        Forgets the pooled connections of every engine of `app`, primary and
+        replicas, without closing them. Called in forked workers, so that
+        they never share a connection opened by the parent process.
+    """
+    with app.app_context():
+        for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ()):
+            db.get_engine(app, bind=bind).dispose(close=False)
+
+
+# The revision before the one creating the venue, artist and show tables. The
+# revisions up to it alter the older quoted tables, or index tables nothing
+# created, so they cannot run on an empty database.
+SCHEMA_BASE_REVISION = 'c7e3f19a5b62'
+
+
+def init_db():
+    """
+        Creates the schema of a new, empty database: marks it as being at
+        SCHEMA_BASE_REVISION, then runs the migrations from there, the first
+        of which creates the venue, artist and show tables.
+    """
+    from flask_migrate import Migrate, stamp, upgrade
 
-db = SQLAlchemy(app)
+    # Outside the flask command, such as when seeding benchmark and test
+    # databases, Flask-Migrate is not set up yet.
+    if 'migrate' not in current_app.extensions:
+        Migrate(current_app, db)
+    tables = db.inspect(db.engine).get_table_names()
+    if tables:
+        raise ValueError('The database already has tables (%s); migrate it '
+                         'with flask db upgrade.' % ', '.join(sorted(tables)))
+    stamp(revision=SCHEMA_BASE_REVISION)
+    upgrade()
+
+
+# ----------------------------------------------------------------------------#
+# Column types.
+# ----------------------------------------------------------------------------#
+
+class StringList(db.TypeDecorator):
+    """
+        List of strings, stored as an ARRAY on Postgres and as JSON on other
+        backends such as SQLite, where there is no array type.
+    """
+    impl = db.JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.ARRAY(db.String))
+        return dialect.type_descriptor(db.JSON())
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def created_at_column():
+    return db.Column(db.DateTime(timezone=True), nullable=False,
+                     default=utc_now, server_default=db.func.now())
+
+
+def updated_at_column():
+    # Also set by UPDATE statements that do not name it, such as the show
+    # counter updates, so that it changes whenever the row does.
+    return db.Column(db.DateTime(timezone=True), nullable=False,
+                     default=utc_now, onupdate=utc_now,
+                     server_default=db.func.now())
 
-migrate = Migrate(app, db)
 
 # ----------------------------------------------------------------------------#
 # Models.
 # ----------------------------------------------------------------------------#
 
 class Venue(db.Model):
+    __table_args__ = (
+        # Find the venues whose next show has gone past, for the counters'
+        # roll-forward.
+        db.Index('ix_venue_next_show_time', 'next_show_time'),
+        # Latest change, for the page ETags.
+        db.Index('ix_venue_updated_at', 'updated_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(StringList)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
+    # Show counters, maintained by counters.py rather than counted on
+    # every listing.
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0,
+                                   server_default='0')
+    num_past_shows = db.Column(db.Integer, nullable=False, default=0,
+                               server_default='0')
+    next_show_time = db.Column(db.DateTime(timezone=True))
+    created_at = created_at_column()
+    updated_at = updated_at_column()
     show_id = db.relationship('Show', backref='show_venue', uselist=False)
 
     def __repr__(self):
@@ -49,17 +131,36 @@ class Venue(db.Model):
 
 
 class Artist(db.Model):
+    __table_args__ = (
+        # Serve the /artists keyset pagination on (name, id), overall and
+        # within a state or a state and city.
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_state_city_name_id', 'state', 'city', 'name',
+                 'id'),
+        db.Index('ix_artist_next_show_time', 'next_show_time'),
+        db.Index('ix_artist_updated_at', 'updated_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(StringList)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
+    # Show counters, maintained by counters.py rather than counted on
+    # every listing.
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0,
+                                   server_default='0')
+    num_past_shows = db.Column(db.Integer, nullable=False, default=0,
+                               server_default='0')
+    next_show_time = db.Column(db.DateTime(timezone=True))
+    created_at = created_at_column()
+    updated_at = updated_at_column()
     show_id = db.relationship('Show', backref='show_artists')
 
     def __repr__(self):
@@ -71,11 +172,51 @@ class Artist(db.Model):
 
 
 class Show(db.Model):
+    __table_args__ = (
+        # Serve the per-venue and per-artist upcoming/past range filters.
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        # Serve the /shows keyset pagination on (start_time, id).
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        db.Index('ix_show_updated_at', 'updated_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey("venue.id"))
     artist_id = db.Column(db.Integer, db.ForeignKey("artist.id"))
     start_time = db.Column(db.DateTime(timezone=True), nullable=False, default=datetime.utcnow())
+    created_at = created_at_column()
+    updated_at = updated_at_column()
 
     def __repr__(self):
         return f'<Show {self.id}, artist: {self.artist_id}, venue: {self.venue_id}, ' \
                f'start_time: {self.start_time}>'
+
+
+class ShowSummary(db.Model):
+    # The next few upcoming shows of each venue ('venue' owner) and artist
+    # ('artist' owner), with the name and image of the artist or venue on
+    # the other side. Maintained by summaries.py.
+    __table_args__ = (
+        # Find the summaries naming a venue or artist that was edited.
+        db.Index('ix_show_summary_owner_other_id', 'owner', 'other_id'),
+    )
+
+    owner = db.Column(db.String(10), primary_key=True)
+    owner_id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    show_id = db.Column(db.Integer, nullable=False)
+    other_id = db.Column(db.Integer, nullable=False)
+    other_name = db.Column(db.String)
+    other_image_link = db.Column(db.String(500))
+    start_time = db.Column(db.DateTime(timezone=True), nullable=False)
+
+
+class ImportCheckpoint(db.Model):
+    # Progress of a `flask import` of one file, committed with each batch,
+    # so that an interrupted import can resume.
+    source = db.Column(db.String, primary_key=True)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    error_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    file_size = db.Column(db.BigInteger)
+    updated_at = db.Column(db.DateTime(timezone=True))
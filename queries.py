@@ -0,0 +1,205 @@
+import base64
+import json
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+
+from flask import g, has_app_context
+
+from models import Artist, Show, Venue, db
+
+
+# ----------------------------------------------------------------------------#
+# Show time predicates.
+# ----------------------------------------------------------------------------#
+
+def day_start(day):
+    # Local midnight of the given date, as a timezone-aware datetime.
+    return datetime.combine(day, time.min).astimezone()
+
+
+def show_day_boundary():
+    """
+        Start of the current day as a timezone-aware datetime. Shows starting
+        at or after it are upcoming, earlier ones are past. The value is
+        computed once and kept on `g` for the rest of the request.
+    """
+    if has_app_context() and 'show_day_boundary' in g:
+        return g.show_day_boundary
+
+    boundary = day_start(date.today())
+    if has_app_context():
+        g.show_day_boundary = boundary
+    return boundary
+
+
+def upcoming_show_filter():
+    # Plain range comparison on the column, so the (venue_id, start_time) and
+    # (artist_id, start_time) indexes can be used.
+    return Show.start_time >= show_day_boundary()
+
+
+def past_show_filter():
+    return Show.start_time < show_day_boundary()
+
+
+def is_upcoming(start_time):
+    # SQLite hands back naive datetimes, compared here as local time.
+    boundary = show_day_boundary()
+    if start_time.tzinfo is None:
+        boundary = boundary.replace(tzinfo=None)
+    return start_time >= boundary
+
+
+def split_shows(show_rows):
+    """
+        Splits joined show rows into lists of past and upcoming show
+        dictionaries, in a single pass and keeping the row order.
+    """
+    past_shows = []
+    upcoming_shows = []
+
+    for show in show_rows:
+        if is_upcoming(show.start_time):
+            upcoming_shows.append(show._asdict())
+        else:
+            past_shows.append(show._asdict())
+
+    return past_shows, upcoming_shows
+
+
+# ----------------------------------------------------------------------------#
+# Keyset pagination.
+# ----------------------------------------------------------------------------#
+
+def encode_cursor(*values):
+    """
+        Packs the sort key of the last row of a page into an opaque,
+        URL-safe cursor string.
+    """
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value
+         for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """
+        Unpacks a cursor made by encode_cursor(), converting each value with
+        the matching callable in `types`. Raises ValueError when the cursor
+        is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(types):
+            raise ValueError('Cursor has %d values, expected %d.'
+                             % (len(values), len(types)))
+        return tuple(cast(value) for cast, value in zip(types, values))
+    except (TypeError, ValueError, UnicodeDecodeError) as error:
+        raise ValueError('Invalid cursor: %s' % cursor) from error
+
+
+class KeysetListing:
+    """
+        One page of `query`, in the order of the unique `key_columns`. `after`
+        is the cursor of the previous page, decoded with `cursor_types`.
+
+        Rows are fetched lazily, `batch_size` at a time, as batches() is
+        iterated. next_cursor, the cursor of the next page, is set once the
+        page has been read to the end; it stays None on the last page.
+    """
+
+    def __init__(self, query, key_columns, cursor_types, limit, after=None,
+                 batch_size=500):
+        self.limit = limit
+        self.batch_size = batch_size
+        self.key_names = [column.key for column in key_columns]
+        self.next_cursor = None
+
+        if after is not None:
+            query = query.filter(db.tuple_(*key_columns) > db.tuple_(
+                *decode_cursor(after, *cursor_types)))
+        # One extra row tells whether there is a next page.
+        self.query = query.order_by(*key_columns).limit(limit + 1)
+
+    def batches(self):
+        rows = iter(self.query.yield_per(self.batch_size))
+        remaining = self.limit
+        last_row = None
+        while remaining:
+            batch = list(islice(rows, min(self.batch_size, remaining)))
+            if not batch:
+                return
+            remaining -= len(batch)
+            last_row = batch[-1]
+            yield batch
+
+        if next(rows, None) is not None:
+            self.next_cursor = encode_cursor(
+                *(getattr(last_row, name) for name in self.key_names))
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch
+
+
+# ----------------------------------------------------------------------------#
+# Shows listing.
+# ----------------------------------------------------------------------------#
+
+class ShowListing(KeysetListing):
+    """
+        Shows joined with their venue and artist names, ordered by
+        (start_time, id). `start_date`/`end_date` bound the listing to an
+        inclusive date window. Without `with_names`, only the show columns
+        are read, for callers looking the names up elsewhere.
+    """
+
+    def __init__(self, limit, after=None, start_date=None, end_date=None,
+                 upcoming_only=False, batch_size=500, with_names=True):
+        if with_names:
+            query = db.session.query(
+                Show.id, Show.venue_id, Venue.name.label('venue_name'),
+                Show.artist_id, Artist.name.label('artist_name'),
+                Artist.image_link.label('artist_image_link'),
+                Show.start_time).join(
+                Venue, Show.venue_id == Venue.id).join(
+                Artist, Show.artist_id == Artist.id)
+        else:
+            query = db.session.query(Show.id, Show.venue_id, Show.artist_id,
+                                     Show.start_time)
+
+        if upcoming_only:
+            query = query.filter(upcoming_show_filter())
+        if start_date is not None:
+            query = query.filter(Show.start_time >= day_start(start_date))
+        if end_date is not None:
+            query = query.filter(
+                Show.start_time < day_start(end_date + timedelta(days=1)))
+
+        super().__init__(query, (Show.start_time, Show.id),
+                         (datetime.fromisoformat, int), limit, after,
+                         batch_size)
+
+
+# ----------------------------------------------------------------------------#
+# Artists listing.
+# ----------------------------------------------------------------------------#
+
+class ArtistListing(KeysetListing):
+    """
+        Artist ids and names, ordered by (name, id), optionally only those
+        of one state and city. Only these columns are read; no Artist object
+        is built.
+    """
+
+    def __init__(self, limit, after=None, state=None, city=None,
+                 batch_size=500):
+        query = db.session.query(Artist.id, Artist.name)
+        if state is not None:
+            query = query.filter(Artist.state == state)
+        if city is not None:
+            query = query.filter(Artist.city == city)
+
+        super().__init__(query, (Artist.name, Artist.id), (str, int), limit,
+                         after, batch_size)
@@ -0,0 +1,150 @@
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, orm
+
+from instrumentation import pool_logger, pool_monitor
+
+
+# ----------------------------------------------------------------------------#
+# Read-replica routing.
+# ----------------------------------------------------------------------------#
+
+class ReplicaRouter:
+    """
+        Sends the reads of read-only requests to replica databases, listed in
+        SQLALCHEMY_REPLICA_URIS. Replicas are used round-robin; one that
+        fails to connect or drops its connection is ejected for
+        REPLICA_EJECT_SECONDS. Everything else, including every flush, stays
+        on the primary.
+
+        After a client writes, its reads stay on the primary for
+        REPLICA_STICKY_SECONDS, so that the page it is redirected to shows
+        its own change even if the replicas lag behind.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.bind_keys = []
+        self.watched = set()
+        self.ejected_until = {}
+        self.eject_seconds = 30
+        self.sticky_seconds = 10
+        self.turns = itertools.count()
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        replica_uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+        if not replica_uris:
+            return
+
+        self.app = app
+        self.eject_seconds = app.config.get('REPLICA_EJECT_SECONDS', 30)
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 10)
+
+        # Each replica becomes a Flask-SQLAlchemy bind. No model uses these
+        # binds, so create_all() never touches them.
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        for index, uri in enumerate(replica_uris):
+            binds['replica_%d' % index] = uri
+            self.bind_keys.append('replica_%d' % index)
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+        app.after_request(self.stick_to_primary_after_write)
+
+    @property
+    def enabled(self):
+        return bool(self.bind_keys)
+
+    def healthy_bind_keys(self):
+        now = time.monotonic()
+        return [key for key in self.bind_keys
+                if self.ejected_until.get(key, 0) <= now]
+
+    def eject(self, bind_key, reason):
+        self.ejected_until[bind_key] = time.monotonic() + self.eject_seconds
+        pool_logger.warning('Read replica %s ejected for %ds: %s', bind_key,
+                            self.eject_seconds, reason)
+
+    def replica_engine(self, db):
+        """
+            Engine of the replica serving the current request's reads, or
+            None when the request must read from the primary.
+        """
+        if not self.enabled or not has_request_context() \
+                or not g.get('use_read_replica'):
+            return None
+        if session.get('read_primary_until', 0) > time.time():
+            return None
+
+        bind_key = g.get('replica_bind_key')
+        if bind_key is None:
+            healthy = self.healthy_bind_keys()
+            if not healthy:
+                return None
+            # One replica per request, so all its reads see the same data.
+            bind_key = g.replica_bind_key = \
+                healthy[next(self.turns) % len(healthy)]
+
+        engine = db.get_engine(self.app, bind=bind_key)
+        if bind_key not in self.watched:
+            self.watch(bind_key, engine)
+        return engine
+
+    def watch(self, bind_key, engine):
+        with self.lock:
+            if bind_key in self.watched:
+                return
+            self.watched.add(bind_key)
+
+        def handle_error(context):
+            # Errors while connecting have no connection yet.
+            if context.is_disconnect or context.connection is None:
+                self.eject(bind_key, context.original_exception)
+
+        event.listen(engine, 'handle_error', handle_error)
+        pool_monitor.watch(engine, self.app.config[
+            'SQLALCHEMY_ENGINE_OPTIONS'].get('max_overflow', 0))
+
+    def stick_to_primary_after_write(self, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') \
+                and not g.get('use_read_replica'):
+            session['read_primary_until'] = time.time() + self.sticky_seconds
+        return response
+
+
+replica_router = ReplicaRouter()
+
+
+def read_replica(view):
+    """
+        Marks a view as read-only, letting its queries go to a read replica.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_read_replica = True
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+class RoutingSession(SignallingSession):
+    # Routes the reads of read-only requests to a replica, and flushes to the
+    # primary.
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing:
+            engine = replica_router.replica_engine(get_state(self.app).db)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,89 @@
+from flask import current_app
+
+from models import db
+from queries import decode_cursor, encode_cursor
+
+
+# ----------------------------------------------------------------------------#
+# Name search.
+# ----------------------------------------------------------------------------#
+
+def search_mode():
+    """
+        'trigram' ranks hits by pg_trgm distance, and relies on the trigram
+        indexes on venue.name and artist.name: GIN for the match, GiST for
+        reading hits in distance order. 'simple' works on any backend, such
+        as SQLite, and ranks prefix matches first.
+    """
+    mode = current_app.config.get('SEARCH_MODE', 'auto')
+    if mode == 'auto':
+        return 'trigram' if db.engine.dialect.name == 'postgresql' \
+            else 'simple'
+    return mode
+
+
+def escape_like(term):
+    # The term is matched literally, so LIKE wildcards in it are escaped
+    # with '!', which needs no quoting in any SQL dialect.
+    return term.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+
+
+def name_distance(name_column, term):
+    # How far a name is from the term, closest first.
+    if search_mode() == 'trigram':
+        # Left bare, so that the GiST index can serve ORDER BY distance
+        # LIMIT n as a nearest-neighbour scan.
+        return name_column.op('<->', return_type=db.REAL)(term)
+    return db.case([(name_column.ilike(escape_like(term) + '%', escape='!'),
+                      0.0)], else_=1.0)
+
+
+def search_by_name(model, term, limit, after=None):
+    """
+        Searches `model` on a partial, case-insensitive name match, most
+        relevant hits first.
+
+        Hits are read in distance order and only up to the page, so that
+        the database never sorts the whole match set; the total number of
+        matches comes from a second query, which stops counting at
+        SEARCH_COUNT_LIMIT.
+
+        Returns a results dictionary with `count`, `count_capped`, `data` and
+        `next_cursor`.
+    """
+    count_limit = current_app.config['SEARCH_COUNT_LIMIT']
+    distance = name_distance(model.name, term)
+    name_filter = model.name.ilike('%' + escape_like(term) + '%', escape='!')
+
+    query = db.select(model.id, model.name, model.num_upcoming_shows,
+                      distance.label('distance')).where(name_filter)
+    if after is not None:
+        after_distance, after_id = decode_cursor(after, float, int)
+        # Compared as a real, as the distance is, so that a hit at the
+        # cursor's distance is not read again.
+        after_distance = db.cast(after_distance, db.REAL)
+        query = query.where(db.or_(
+            distance > after_distance,
+            db.and_(distance == after_distance, model.id > after_id)))
+
+    # One extra row tells whether there is a next page.
+    rows = db.session.execute(query.order_by(distance, model.id).limit(
+        limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].distance, rows[-1].id)
+
+    capped_matches = db.select(model.id).where(name_filter).limit(
+        count_limit).subquery()
+    count = db.session.execute(db.select(db.func.count()).select_from(
+        capped_matches)).scalar()
+
+    return {
+        "count": count, "count_capped": count >= count_limit,
+        "data": [{"id": row.id, "name": row.name,
+                  "num_upcoming_shows": row.num_upcoming_shows}
+                 for row in rows],
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,57 @@
+from functools import wraps
+
+from flask import current_app, g, render_template, session, \
+    stream_template
+from flask_wtf.csrf import generate_csrf
+
+
+# ----------------------------------------------------------------------------#
+# Streamed pages.
+# ----------------------------------------------------------------------------#
+
+def streamed(view):
+    """
+        Opts a view in to streaming: with STREAM_TEMPLATES on, the pages it
+        renders with render_page() are sent in chunks as the template runs,
+        instead of being rendered to one string first.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.stream_template = current_app.config.get('STREAM_TEMPLATES', False)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def buffered(chunks, size):
+    # Joins the many small pieces of template output into chunks of at least
+    # `size` characters.
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def render_page(template_name, **context):
+    """
+        Renders a page, streamed when the view is marked @streamed, and as
+        one string otherwise. Lazy iterables in `context` are then consumed
+        while the response is being sent.
+    """
+    # Flash messages and new CSRF tokens live in the session, which is saved
+    # before a streamed body is generated.
+    if not g.get('stream_template') or session.get('_flashes'):
+        return render_template(template_name, **context)
+    if 'csrf' in current_app.extensions:
+        generate_csrf()
+
+    chunks = buffered(stream_template(template_name, **context),
+                      current_app.config.get('STREAM_CHUNK_SIZE', 16384))
+    return current_app.response_class(chunks, mimetype='text/html')
@@ -0,0 +1,183 @@
+from itertools import islice
+
+import click
+from flask import current_app
+
+from models import Artist, Show, ShowSummary, Venue, db
+from queries import show_day_boundary
+
+
+# ----------------------------------------------------------------------------#
+# Upcoming show summaries.
+# ----------------------------------------------------------------------------#
+
+# For each owner kind: its model and Show foreign key, then the model and
+# foreign key of the other side of its shows.
+OWNERS = {
+    'venue': (Venue, Show.venue_id, Artist, Show.artist_id),
+    'artist': (Artist, Show.artist_id, Venue, Show.venue_id),
+}
+
+
+def summary_size():
+    return current_app.config.get('SUMMARY_SHOWS', 3)
+
+
+def lock_rows(venue_ids=(), artist_ids=()):
+    """
+        Locks the given venue rows, then the artist rows, each in id order,
+        until the current transaction ends. Writers changing venues and
+        artists together take their locks through here before any UPDATE or
+        flush, so that two of them never wait on each other's rows in
+        opposite orders and deadlock.
+    """
+    for model, ids in ((Venue, venue_ids), (Artist, artist_ids)):
+        ids = sorted(set(ids))
+        if ids:
+            with db.session.no_autoflush:
+                db.session.query(model.id).filter(model.id.in_(ids)) \
+                    .order_by(model.id).with_for_update().all()
+
+
+def refresh(owner, ids=None, id_range=None):
+    """
+        Rebuilds the summaries of the `ids` venues or artists, of those with
+        ids in the inclusive `id_range`, or of all of them, in the current
+        transaction: their next SUMMARY_SHOWS upcoming shows, with the name
+        and image of the artist or venue.
+
+        Each owner's rows are replaced by one DELETE and one INSERT ...
+        SELECT, so readers see either the old or the new summary. The owner
+        rows are locked first, in id order, so that two writers refreshing
+        the same summary take turns; writers also changing the other side
+        lock both with lock_rows() before.
+    """
+    model, owner_column, other_model, other_column = OWNERS[owner]
+    if ids is not None:
+        ids = set(ids)
+        if not ids:
+            return
+
+    def owned(column):
+        if ids is not None:
+            return column.in_(ids)
+        if id_range is not None:
+            return column.between(*id_range)
+        return db.true()
+
+    db.session.query(model.id).filter(owned(model.id)).order_by(model.id) \
+        .with_for_update().all()
+    db.session.execute(db.delete(ShowSummary).where(
+        ShowSummary.owner == owner, owned(ShowSummary.owner_id))
+        .execution_options(synchronize_session=False))
+
+    rank = db.func.row_number().over(partition_by=owner_column,
+                                     order_by=(Show.start_time, Show.id))
+    shows = db.select(
+        owner_column.label('owner_id'), rank.label('rank'),
+        Show.id.label('show_id'), other_column.label('other_id'),
+        other_model.name.label('other_name'),
+        other_model.image_link.label('other_image_link'),
+        Show.start_time).join(other_model, other_column == other_model.id) \
+        .where(Show.start_time >= show_day_boundary(),
+               owned(owner_column)).subquery()
+
+    columns = ['owner', 'owner_id', 'rank', 'show_id', 'other_id',
+               'other_name', 'other_image_link', 'start_time']
+    db.session.execute(db.insert(ShowSummary).from_select(
+        columns, db.select(db.literal(owner), *(shows.c[name]
+                                                for name in columns[1:]))
+        .where(shows.c.rank <= summary_size())))
+
+
+def referencing(other, other_id):
+    """
+        Ids of the artists or venues whose summaries name the venue or artist
+        `other_id`. Writers changing its name or image lock these with
+        lock_rows() and then refresh the same ids.
+    """
+    owner = 'artist' if other == 'venue' else 'venue'
+    return [row.owner_id for row in db.session.query(
+        ShowSummary.owner_id).filter(ShowSummary.owner == owner,
+                                     ShowSummary.other_id == other_id)]
+
+
+def summaries_for(owner, ids):
+    """
+        The summarized upcoming shows of the `ids` venues or artists, in one
+        query, as lists of show dictionaries keyed by owner id. Shows that
+        started before today are left out until the next refresh.
+    """
+    other = 'artist' if owner == 'venue' else 'venue'
+    rows = db.session.query(
+        ShowSummary.owner_id, ShowSummary.other_id, ShowSummary.other_name,
+        ShowSummary.other_image_link, ShowSummary.start_time).filter(
+        ShowSummary.owner == owner, ShowSummary.owner_id.in_(ids),
+        ShowSummary.start_time >= show_day_boundary()).order_by(
+        ShowSummary.owner_id, ShowSummary.rank)
+
+    summaries = {}
+    for row in rows:
+        summaries.setdefault(row.owner_id, []).append({
+            "%s_id" % other: row.other_id,
+            "%s_name" % other: row.other_name,
+            "%s_image_link" % other: row.other_image_link,
+            "start_time": row.start_time,
+        })
+    return summaries
+
+
+def add_upcoming_shows(items, owner):
+    # Sets 'upcoming_shows' on a page of venue or artist dictionaries.
+    summaries = summaries_for(owner, [item["id"] for item in items])
+    for item in items:
+        item["upcoming_shows"] = summaries.get(item["id"], [])
+    return items
+
+
+def with_upcoming_shows(rows, owner, batch_size):
+    """
+        Yields (row, upcoming shows) for rows of venues or artists, reading
+        the summaries of `batch_size` rows at a time.
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        summaries = summaries_for(owner, [row.id for row in batch])
+        for row in batch:
+            yield row, summaries.get(row.id, [])
+
+
+# ----------------------------------------------------------------------------#
+# Flask integration.
+# ----------------------------------------------------------------------------#
+
+class ShowSummaries:
+    """
+        `flask refresh-summaries` rebuilds every venue and artist summary,
+        SUMMARY_REFRESH_BATCH_SIZE owners per transaction. Writes otherwise
+        refresh only the summaries they touch.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        @app.cli.command('refresh-summaries')
+        def refresh_summaries_command():
+            """Rebuild the upcoming show summaries of venues and artists."""
+            batch_size = app.config['SUMMARY_REFRESH_BATCH_SIZE']
+            for owner, (model, *_) in OWNERS.items():
+                last_id = db.session.query(db.func.max(model.id)).scalar()
+                for first_id in range(1, (last_id or 0) + 1, batch_size):
+                    refresh(owner, id_range=(first_id,
+                                             first_id + batch_size - 1))
+                    db.session.commit()
+                click.echo('%s: refreshed up to id %d' % (owner,
+                                                         last_id or 0))
+
+
+show_summaries = ShowSummaries()
@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from config import TestConfig
+from models import db
+
+
+class FixtureConfig(TestConfig):
+    # Always in-memory SQLite, whatever DATABASE_URL says, and no caching,
+    # so that every request reaches the database.
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    CACHE_TYPE = 'null'
+    ENTITY_CACHE_MAX_ENTRIES = 0
+    # Checked against the statements counted here.
+    SQL_INSTRUMENTATION = True
+    METRICS_ENABLED = True
+    # Exports up to the latest change, for tests to export what they wrote.
+    EXPORT_LAG_SECONDS = 0
+    EXPORT_TOKENS = ['test-token']
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    from benchmarks.seed import seed
+
+    config = FixtureConfig()
+    config.SQL_LOG_FILE = str(tmp_path_factory.mktemp('logs') / 'sql.log')
+    app = create_app(config)
+    with app.app_context():
+        seed(db, venues=60, artists=60, shows=600)
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def statements(app):
+    """
+        List of the SQL statements run while the test runs, streamed
+        responses included.
+    """
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield recorded
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def check_counters(app):
+    """
+        Function asserting that the stored show counters and summaries of
+        every venue and artist match those computed again from the shows.
+    """
+    from counters import COUNTED, find_drift
+    from models import ShowSummary
+    from summaries import refresh
+
+    def summaries():
+        return db.session.query(
+            ShowSummary.owner, ShowSummary.owner_id, ShowSummary.rank,
+            ShowSummary.show_id, ShowSummary.other_name,
+            ShowSummary.other_image_link, ShowSummary.start_time).order_by(
+            ShowSummary.owner, ShowSummary.owner_id, ShowSummary.rank).all()
+
+    def check():
+        for model in COUNTED:
+            last_id = db.session.query(db.func.max(model.id)).scalar()
+            assert find_drift(model, 1, last_id) == []
+
+        stored = summaries()
+        try:
+            refresh('venue')
+            refresh('artist')
+            assert summaries() == stored
+        finally:
+            db.session.rollback()
+
+    return check
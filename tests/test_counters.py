@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from models import Artist, ShowSummary, Venue, db
+
+
+def artist_form(artist, **changes):
+    form = {"name": artist.name, "city": artist.city, "state": artist.state,
+            "phone": artist.phone or '', "genres": ['Jazz'],
+            "facebook_link": 'https://www.facebook.com/fyyur'}
+    form.update(changes)
+    return form
+
+
+def venue_form(venue, **changes):
+    form = {"name": venue.name, "city": venue.city, "state": venue.state,
+            "address": venue.address, "phone": venue.phone or '',
+            "genres": ['Jazz'],
+            "facebook_link": 'https://www.facebook.com/fyyur'}
+    form.update(changes)
+    return form
+
+
+def test_counters_after_edits(client, check_counters):
+    check_counters()
+
+    # Upcoming and past shows, added to the counters one at a time.
+    for days in (2, 5, -4):
+        start_time = datetime.now() + timedelta(days=days)
+        response = client.post('/shows/create', data={
+            "venue_id": '11', "artist_id": '12',
+            "start_time": start_time.strftime('%Y-%m-%d %H:%M:%S')})
+        assert response.status_code == 200
+    check_counters()
+
+    # Renames reach the summaries naming the artist or venue.
+    response = client.post('/artists/12/edit', data=artist_form(
+        db.session.get(Artist, 12), name='Renamed for the summaries'))
+    assert response.status_code == 302
+    response = client.post('/venues/11/edit', data=venue_form(
+        db.session.get(Venue, 11), name='Renamed venue'))
+    assert response.status_code == 302
+    check_counters()
+
+    names = {row.other_name for row in db.session.query(
+        ShowSummary.other_name).filter(ShowSummary.other_id.in_([11, 12]))}
+    assert {'Renamed for the summaries', 'Renamed venue'} <= names
@@ -0,0 +1,80 @@
+import csv
+import io
+import time
+
+from exporter import Export, format_watermark, parse_watermark, \
+    read_watermark
+from models import Venue, db
+from summaries import refresh as refresh_summaries, referencing
+
+AUTHORIZATION = {"Authorization": 'Bearer test-token'}
+
+
+def rename_venue(venue_id, name):
+    # Changed after the previous export's watermark, and before the next,
+    # with the summaries naming it, as the edit form does.
+    time.sleep(0.01)
+    db.session.get(Venue, venue_id).name = name
+    refresh_summaries('artist', referencing('venue', venue_id))
+    db.session.commit()
+    time.sleep(0.01)
+
+
+def exported_ids(data):
+    return [int(row["id"]) for row in csv.DictReader(io.StringIO(data))]
+
+
+def test_incremental_exports(app, tmp_path):
+    runner = app.test_cli_runner()
+    watermark_file = str(tmp_path / 'venues.watermark')
+    output = tmp_path / 'venues.csv'
+
+    def export():
+        result = runner.invoke(args=[
+            'export', 'venues', '--watermark-file', watermark_file,
+            '-o', str(output)])
+        assert result.exit_code == 0, result.output
+        return exported_ids(output.read_text())
+
+    assert sorted(export()) == sorted(
+        id for id, in db.session.query(Venue.id))
+    first_watermark = read_watermark(watermark_file)
+
+    # Updated rows are exported again, and only they are.
+    rename_venue(2, 'Renamed for the export')
+    assert export() == [2]
+    assert read_watermark(watermark_file) > first_watermark
+    assert export() == []
+
+
+def test_rows_within_the_lag_are_left_for_the_next_export(app):
+    rename_venue(3, 'Changed just now')
+    ids = [row.id for batch in Export('venues', lag=3600).batches()
+           for row in batch]
+    assert 3 not in ids
+
+
+def test_export_endpoint_watermark(client):
+    response = client.get('/exports/venues.csv', headers=AUTHORIZATION)
+    assert response.status_code == 200
+    watermark = response.headers["X-Export-Watermark"]
+    assert exported_ids(response.get_data(as_text=True))
+
+    rename_venue(4, 'Renamed for the endpoint')
+    response = client.get('/exports/venues.csv?since=' + watermark,
+                          headers=AUTHORIZATION)
+    assert exported_ids(response.get_data(as_text=True)) == [4]
+    assert response.headers["X-Export-Watermark"] > watermark
+
+
+def test_export_endpoint_errors(client):
+    assert client.get('/exports/venues.csv').status_code == 401
+    assert client.get('/exports/venues.csv?since=12',
+                      headers=AUTHORIZATION).status_code == 400
+
+
+def test_watermark_format():
+    watermark = parse_watermark('2026-01-02T03:04:05.000006Z')
+    assert format_watermark(watermark) == '2026-01-02T03:04:05.000006Z'
+    # Naive times are in UTC, as updated_at.
+    assert parse_watermark('2026-01-02 03:04:05.000006') == watermark
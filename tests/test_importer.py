@@ -0,0 +1,96 @@
+import json
+from datetime import datetime, timedelta
+
+from importer import Importer
+from models import ImportCheckpoint, Show, db
+
+
+class Interrupted(Exception):
+    pass
+
+
+def show_records():
+    # Upcoming and past shows, with two records that are rejected.
+    today = datetime.now().replace(hour=20, minute=0, second=0,
+                                   microsecond=0)
+    records = [
+        {"venue_id": 1 + number, "artist_id": 2 + number,
+         "start_time": (today + timedelta(days=number - 3)).strftime(
+             '%Y-%m-%d %H:%M:%S')}
+        for number in range(8)]
+    records[2]["venue_id"] = 100000
+    records[5]["start_time"] = 'next friday'
+    return records
+
+
+def test_resume_from_checkpoint(app, tmp_path, monkeypatch, check_counters):
+    runner = app.test_cli_runner()
+    path = tmp_path / 'shows.ndjson'
+    path.write_text(''.join(json.dumps(record) + '\n'
+                            for record in show_records()))
+    errors_path = tmp_path / 'shows.errors.ndjson'
+    args = ['import', 'shows', str(path), '--batch-size', '2',
+            '--errors', str(errors_path)]
+    shows_before = db.session.query(Show).count()
+
+    # Interrupted while loading its third batch.
+    load_batch = Importer.load_batch
+    calls = []
+
+    def interrupted_load_batch(self, schema, rows):
+        calls.append(rows)
+        if len(calls) == 3:
+            raise Interrupted
+        return load_batch(self, schema, rows)
+
+    monkeypatch.setattr(Importer, 'load_batch', interrupted_load_batch)
+    result = runner.invoke(args=args)
+    assert isinstance(result.exception, Interrupted)
+    db.session.rollback()
+
+    checkpoint = db.session.query(ImportCheckpoint).one()
+    assert checkpoint.rows == 4
+    assert db.session.query(Show).count() == shows_before + 3
+
+    monkeypatch.setattr(Importer, 'load_batch', load_batch)
+    result = runner.invoke(args=args)
+    assert result.exit_code == 0, result.output
+    assert 'Resuming after record 4.' in result.output
+    assert '3 loaded, 1 rejected' in result.output
+
+    # Every valid record loaded once, and every invalid one reported once.
+    assert db.session.query(Show).count() == shows_before + 6
+    errors = [json.loads(line)
+              for line in errors_path.read_text().splitlines()]
+    assert [error["record"] for error in errors] == [3, 6]
+    assert list(errors[0]["errors"]) == ['venue_id']
+    assert list(errors[1]["errors"]) == ['start_time']
+    assert db.session.query(ImportCheckpoint).count() == 0
+
+    check_counters()
+
+
+def test_changed_file_is_not_resumed(app, tmp_path, monkeypatch):
+    runner = app.test_cli_runner()
+    path = tmp_path / 'shows.ndjson'
+    path.write_text(''.join(json.dumps(record) + '\n'
+                            for record in show_records()))
+    args = ['import', 'shows', str(path), '--batch-size', '2']
+
+    def interrupted_load_batch(self, schema, rows):
+        raise Interrupted
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Importer, 'load_batch', interrupted_load_batch)
+        runner.invoke(args=args)
+    db.session.rollback()
+
+    with path.open('a') as file:
+        file.write(json.dumps(show_records()[0]) + '\n')
+    result = runner.invoke(args=args)
+    assert result.exit_code != 0
+    assert 'use --restart' in result.output
+
+    result = runner.invoke(args=args + ['--restart'])
+    assert result.exit_code == 0, result.output
+    assert db.session.query(ImportCheckpoint).count() == 0
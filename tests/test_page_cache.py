@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from cache import LRUBackend, page_cache
+from models import Venue, db
+from summaries import refresh as refresh_summaries, referencing
+
+
+@pytest.fixture(autouse=True)
+def page_cache_backend(monkeypatch):
+    # The fixture app caches nothing; these tests cache in memory.
+    monkeypatch.setattr(page_cache, 'backend', LRUBackend(1024 * 1024))
+
+
+def get(client, path, **kwargs):
+    response = client.get(path, **kwargs)
+    response.get_data()  # Streamed pages are cached once read.
+    response.close()
+    return response
+
+
+def test_cache_key(client, statements):
+    first = get(client, '/venues/1')
+    etag, weak = first.get_etag()
+    assert weak
+    assert page_cache.get('page:%s:/venues/1?' % etag) == \
+        first.get_data(as_text=True)
+
+    # Only the version is read again.
+    del statements[:]
+    second = get(client, '/venues/1')
+    assert second.get_data() == first.get_data()
+    assert len(statements) == 1
+
+    # Another query string is another page.
+    del statements[:]
+    get(client, '/venues/1?view=all')
+    assert len(statements) > 1
+
+
+def test_streamed_listing_is_cached(client, statements):
+    first = get(client, '/venues')
+    del statements[:]
+    second = get(client, '/venues')
+    assert second.get_data() == first.get_data()
+    assert len(statements) == 1
+
+
+def test_tag_invalidation(client, statements):
+    get(client, '/venues/1')
+    hits = page_cache.stats()["hits"]
+
+    page_cache.invalidate('venue:2')
+    get(client, '/venues/1')
+    assert page_cache.stats()["hits"] == hits + 1
+
+    page_cache.invalidate('venue:1')
+    del statements[:]
+    response = get(client, '/venues/1')
+    assert response.status_code == 200
+    assert page_cache.stats()["hits"] == hits + 1
+    assert len(statements) > 1
+
+
+def test_not_modified(client, statements):
+    etag = get(client, '/venues/5').headers["ETag"]
+
+    del statements[:]
+    response = get(client, '/venues/5', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers["ETag"] == etag
+    assert len(statements) == 1
+
+    # A changed venue is a new version.
+    time.sleep(0.01)
+    db.session.get(Venue, 5).name = 'Renamed for the ETag'
+    refresh_summaries('artist', referencing('venue', 5))
+    db.session.commit()
+    response = get(client, '/venues/5', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert 'Renamed for the ETag' in response.get_data(as_text=True)
+
+
+def test_vary_cookie(client):
+    response = get(client, '/venues/1')
+    assert 'Cookie' in response.vary
+    assert response.headers["Cache-Control"] == 'public, no-cache'
+
+    response = get(client, '/venues/1',
+                   headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert 'Cookie' in response.vary
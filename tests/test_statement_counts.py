@@ -0,0 +1,62 @@
+import json
+import logging
+
+import pytest
+
+from metrics import metrics
+
+
+# Statements per page, whatever the number of venues, artists and shows.
+# A page going over its ceiling most likely queries once per row.
+CEILINGS = [
+    ('/venues', 3),
+    ('/venues/1', 3),
+    ('/artists', 3),
+    ('/artists/1', 3),
+    ('/shows', 4),
+    ('/shows?upcoming=1', 4),
+]
+
+
+@pytest.mark.parametrize('path, ceiling', CEILINGS)
+def test_statement_count(client, statements, path, ceiling):
+    response = client.get(path)
+    response.get_data()  # Reads streamed pages to the end.
+
+    assert response.status_code == 200
+    assert len(statements) <= ceiling, '\n\n'.join(statements)
+
+
+def test_missing_venue_statement_count(client, statements):
+    assert client.get('/venues/100000').status_code == 404
+    assert len(statements) <= 2
+
+
+def db_statements_total(endpoint):
+    for name, labels, value in metrics.registry.snapshot()["counters"]:
+        if name == 'fyyur_db_statements_total' and \
+                dict(labels) == {"endpoint": endpoint}:
+            return value
+    return 0
+
+
+@pytest.mark.parametrize('path, endpoint', [
+    ('/venues', 'main.venues'),
+    ('/artists', 'main.artists'),
+    ('/shows', 'main.shows'),
+])
+def test_streamed_page_accounting(client, statements, caplog, path,
+                                  endpoint):
+    # The listings query while their bodies stream, after the headers.
+    before = db_statements_total(endpoint)
+    with caplog.at_level(logging.INFO, logger='fyyur.sql'):
+        response = client.get(path)
+        assert response.is_streamed
+        response.get_data()
+        response.close()
+
+    records = [json.loads(record.getMessage()) for record in caplog.records
+               if record.name == 'fyyur.sql']
+    assert [record["statements"] for record in records] == [len(statements)]
+    assert db_statements_total(endpoint) - before == len(statements)
+    assert 'Server-Timing' not in response.headers
@@ -0,0 +1,112 @@
+import hashlib
+import os
+from collections import namedtuple
+from datetime import timezone
+
+from flask import current_app
+
+from assets import assets
+from models import Artist, Show, Venue, db
+from queries import show_day_boundary
+from routing import read_replica
+
+
+# ----------------------------------------------------------------------------#
+# Page versions.
+# ----------------------------------------------------------------------------#
+
+# What a page is built from, as an ETag value and a Last-Modified time,
+# computed without rendering it.
+PageVersion = namedtuple('PageVersion', ['etag', 'last_modified'])
+
+template_digests = {}
+
+
+def template_digest():
+    # Digest of the template sources and of the asset manifest, so that a
+    # release changing the markup or the assets also changes every ETag.
+    # The template part is computed once per process.
+    folder = os.path.join(current_app.root_path, current_app.template_folder)
+    if folder not in template_digests:
+        digest = hashlib.sha1()
+        for directory, subdirectories, files in sorted(os.walk(folder)):
+            subdirectories.sort()
+            for name in sorted(files):
+                path = os.path.join(directory, name)
+                digest.update(os.path.relpath(path, folder).encode())
+                with open(path, 'rb') as file:
+                    digest.update(file.read())
+        template_digests[folder] = digest.hexdigest()
+    assets.load(current_app)
+    return '%s.%s' % (template_digests[folder], assets.version)
+
+
+def as_utc(value):
+    # SQLite hands back naive datetimes, stored in UTC.
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def page_version(*changes):
+    """
+        The version of a page built from rows last changed at `changes`
+        (None for rows that do not exist). Pages split shows into past and
+        upcoming, so the start of the current day counts as a change too.
+    """
+    changes = [as_utc(change) if change is not None else None
+               for change in changes]
+    boundary = as_utc(show_day_boundary())
+    parts = [template_digest(), boundary.isoformat()]
+    parts += [change.isoformat() if change else '-' for change in changes]
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    return PageVersion(etag, max([change for change in changes if change]
+                                 + [boundary]))
+
+
+def latest(column, *criteria, join=None):
+    # max(column) over the rows matching `criteria`, as a scalar subquery.
+    query = db.select(db.func.max(column))
+    if join is not None:
+        query = query.select_from(Show).join(*join)
+    return query.where(*criteria).scalar_subquery()
+
+
+# Read from the same database as the pages they describe.
+
+@read_replica
+def data_version():
+    """
+        Version of the listing pages, which may show any venue, artist or
+        show: the latest change to each table, each read from its updated_at
+        index.
+    """
+    return page_version(*db.session.query(
+        latest(Venue.updated_at), latest(Artist.updated_at),
+        latest(Show.updated_at)).one())
+
+
+@read_replica
+def venue_version(venue_id):
+    # The venue page: the venue, its shows and their artists. None when
+    # there is no such venue.
+    row = db.session.query(
+        Venue.updated_at,
+        latest(Show.updated_at, Show.venue_id == venue_id),
+        latest(Artist.updated_at, Show.venue_id == venue_id,
+               join=(Artist, Show.artist_id == Artist.id))).filter(
+        Venue.id == venue_id).first()
+    return page_version(*row) if row is not None else None
+
+
+@read_replica
+def artist_version(artist_id):
+    # The artist page: the artist, its shows and their venues. None when
+    # there is no such artist.
+    row = db.session.query(
+        Artist.updated_at,
+        latest(Show.updated_at, Show.artist_id == artist_id),
+        latest(Venue.updated_at, Show.artist_id == artist_id,
+               join=(Venue, Show.venue_id == Venue.id))).filter(
+        Artist.id == artist_id).first()
+    return page_version(*row) if row is not None else None
@@ -0,0 +1,693 @@
+# ----------------------------------------------------------------------------#
+# Imports
+# ----------------------------------------------------------------------------#
+
+import sys
+from datetime import date
+from itertools import groupby
+
+from flask import Blueprint, current_app, render_template, request, flash, \
+    redirect, url_for, abort
+
+from cache import page_cache, add_cache_tags
+from counters import count_show
+from entities import entity_cache
+from formatting import datetime_formatter, add_start_time_text
+from forms import ArtistForm, ShowForm, VenueForm
+from models import Venue, Show, Artist, db
+from queries import show_day_boundary, split_shows, ArtistListing, \
+    ShowListing
+from routing import read_replica
+from search import search_by_name
+from streaming import render_page, streamed
+from summaries import add_upcoming_shows, with_upcoming_shows, lock_rows, \
+    refresh as refresh_summaries, referencing
+from versions import artist_version, data_version, venue_version
+
+
+main = Blueprint('main', __name__)
+
+
+# ----------------------------------------------------------------------------#
+# Filters.
+# ----------------------------------------------------------------------------#
+
+@main.app_template_filter('datetime')
+def format_datetime(value, format='medium'):
+    return datetime_formatter.format(value, format)
+
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+@main.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+def parse_date_arg(name):
+    # Optional YYYY-MM-DD query string argument; ValueError when malformed.
+    value = request.args.get(name)
+    if not value:
+        return None
+    return date.fromisoformat(value)
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@main.route('/venues', methods=['GET'])
+@page_cache.cached_page('venue-list', version=data_version)
+@streamed
+@read_replica
+def venues():
+    # Every venue with its stored upcoming show count, in a single query,
+    # and its next shows from the summaries, a batch of venues at a time.
+    # Venues are grouped by (city, state) while the page renders, so that
+    # same-named cities in different states are kept apart.
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    venue_rows = db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state,
+        Venue.num_upcoming_shows).order_by(
+        Venue.state, Venue.city, Venue.name).yield_per(batch_size)
+
+    return render_page('pages/venues.html', areas=venue_areas(
+        with_upcoming_shows(venue_rows, 'venue', batch_size)))
+
+
+def venue_areas(venue_rows):
+    # Groups the ordered (venue row, upcoming shows) pairs into area
+    # dictionaries as they are read.
+    day = show_day_boundary().date().isoformat()
+    for (city, state), area_rows in groupby(
+            venue_rows, key=lambda pair: (pair[0].city, pair[0].state)):
+        venues = [{"id": venue_row.id, "name": venue_row.name,
+                   "num_upcoming_shows": venue_row.num_upcoming_shows,
+                   "upcoming_shows": upcoming_shows}
+                  for venue_row, upcoming_shows in area_rows]
+        # The area's fragment shows which shows are upcoming, so it is
+        # cached for the day, and dropped when one of its venues or of the
+        # artists it names changes.
+        yield {
+            "city": city, "state": state, "venues": venues,
+            "cache_key": ('venue-area', day, city, state,
+                          ','.join(str(venue["id"]) for venue in venues)),
+            "cache_tags": ['venue:%d' % venue["id"] for venue in venues] + [
+                'artist:%d' % show["artist_id"] for venue in venues
+                for show in venue["upcoming_shows"]],
+        }
+
+
+@main.route('/venues/search', methods=['POST'])
+@read_replica
+def search_venues():
+    # Searches on artists with partial string search. Ensure it is case-insensitive.
+    # A search for Hop should return "The Musical Hop".
+    # A search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+
+    search_term = request.form.get('search_term', '')
+    try:
+        response = search_by_name(
+            Venue, search_term,
+            current_app.config['SEARCH_RESULTS_PER_PAGE'],
+            after=request.form.get('after') or None)
+    except ValueError:
+        abort(400)
+    add_upcoming_shows(response["data"], 'venue')
+
+    return render_template('pages/search_venues.html', results=response,
+                           search_term=search_term)
+
+
+@main.route('/venues/<int:venue_id>')
+@page_cache.cached_page('venue:{venue_id}', version=venue_version)
+@read_replica
+def show_venue(venue_id):
+    # Shows the venue page with the given venue_id.
+
+    selected_venue = entity_cache.get(Venue, venue_id)
+    if selected_venue is None:
+        abort(404)
+
+    # All shows at this venue in one query, split into past and upcoming below.
+    venue_shows = db.session.query(Show.artist_id,
+                                   Artist.name.label('artist_name'),
+                                   Artist.image_link.label('artist_image_link'),
+                                   Show.start_time).join(Artist,
+                                                         Show.artist_id == Artist.id).filter(
+        Show.venue_id == venue_id).order_by(Show.start_time).all()
+    past_shows, upcoming_shows = split_shows(venue_shows)
+    add_start_time_text(past_shows + upcoming_shows)
+    add_cache_tags(*{'artist:%d' % show.artist_id for show in venue_shows})
+
+    # Aggregating data from the Venue, with their respective Shows data.
+    data = {
+        "id": selected_venue.id, "name": selected_venue.name,
+        "genres": selected_venue.genres, "city": selected_venue.city,
+        "state": selected_venue.state, "address": selected_venue.address,
+        "phone": selected_venue.phone,
+        "seeking_talent": selected_venue.seeking_talent,
+        "facebook_link": selected_venue.facebook_link,
+        "website": selected_venue.website_link,
+        "image_link": selected_venue.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+    }
+
+    return render_template('pages/show_venue.html', venue=data)
+
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@main.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@main.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # For inserting form data as a new Venue record in the db.
+
+    error = False
+    form = VenueForm()
+
+    if form.validate_on_submit():
+        try:
+            name = form.name.data
+            city = form.city.data
+            state = form.state.data
+            address = form.address.data
+            phone = form.phone.data
+            genres = form.genres.data
+            image_link = form.image_link.data
+            facebook_link = form.facebook_link.data
+            website_link = form.website_link.data
+            seeking_talent = form.seeking_talent.data
+            seeking_description = form.seeking_description.data
+
+            venue = Venue(name=name, city=city, state=state, address=address,
+                          phone=phone, genres=genres, image_link=image_link,
+                          facebook_link=facebook_link,
+                          website_link=website_link,
+                          seeking_talent=seeking_talent,
+                          seeking_description=seeking_description)
+
+            db.session.add(venue)
+            db.session.commit()
+            # Drops a cached miss for the new id.
+            entity_cache.invalidate(Venue, venue.id)
+            page_cache.invalidate('venue-list')
+
+            # On successful db insert, flash success
+            flash('Artist ' + venue.name + ' was successfully listed!')
+        except:
+            error = True
+            db.session.rollback()
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+
+        if error:
+            # On unsuccessful db insert, flash an error instead.
+            flash(
+                'An error occurred. Venue ' + venue.name + ' could not be listed.')
+            abort(400)
+        else:
+
+            return render_template('pages/home.html')
+    else:
+
+        return render_template('forms/new_venue.html', form=form)
+
+
+@main.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    # Endpoint takes a venue_id, and using SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return None
+
+
+#  Artists
+#  ----------------------------------------------------------------
+@main.route('/artists')
+@page_cache.cached_page('artist-list', version=data_version)
+@streamed
+@read_replica
+def artists():
+    """
+        Displays one page of artists at /artists, by name, optionally only
+        those of one state (?state=) and city (?city=).
+    """
+
+    try:
+        config = current_app.config
+        limit = min(request.args.get('limit', config['ARTISTS_PER_PAGE'],
+                                     type=int), config['ARTISTS_MAX_PER_PAGE'])
+        listing = ArtistListing(
+            max(limit, 1), after=request.args.get('after'),
+            state=request.args.get('state') or None,
+            city=request.args.get('city') or None,
+            batch_size=config['STREAM_BATCH_SIZE'])
+    except ValueError:
+        abort(400)
+
+    # Filters carried over to the next page link.
+    filters = {key: value for key, value in request.args.items()
+               if key in ('state', 'city', 'limit')}
+
+    return render_page('pages/artists.html', artists=artist_tiles(listing),
+                       listing=listing, filters=filters)
+
+
+def artist_tiles(listing):
+    # Artist dictionaries with their next shows, read a batch at a time.
+    for batch in listing.batches():
+        yield from add_upcoming_shows(
+            [{"id": artist.id, "name": artist.name} for artist in batch],
+            'artist')
+
+
+@main.route('/artists/search', methods=['POST'])
+@read_replica
+def search_artists():
+    """
+        Search on artists with partial string search. Ensure it is case-insensitive.
+        A search for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+        A search for "band" should return "The Wild Sax Band".
+    """
+
+    search_term = request.form.get('search_term', '')
+    try:
+        response = search_by_name(
+            Artist, search_term,
+            current_app.config['SEARCH_RESULTS_PER_PAGE'],
+            after=request.form.get('after') or None)
+    except ValueError:
+        abort(400)
+    add_upcoming_shows(response["data"], 'artist')
+
+    return render_template('pages/search_artists.html', results=response,
+                           search_term=search_term)
+
+
+@main.route('/artists/<int:artist_id>')
+@page_cache.cached_page('artist:{artist_id}', version=artist_version)
+@read_replica
+def show_artist(artist_id):
+    # Showing the artist page with the given artist_id.
+    db_artist = entity_cache.get(Artist, artist_id)
+    if db_artist is None:
+        abort(404)
+
+    # All shows of this artist in one query, split into past and upcoming below.
+    artist_shows = db.session.query(Show.venue_id,
+                                    Venue.name.label('venue_name'),
+                                    Venue.image_link.label('venue_image_link'),
+                                    Show.start_time).join(Venue,
+                                                          Show.venue_id == Venue.id).filter(
+        Show.artist_id == artist_id).order_by(Show.start_time).all()
+    past_shows, upcoming_shows = split_shows(artist_shows)
+    add_start_time_text(past_shows + upcoming_shows)
+    add_cache_tags(*{'venue:%d' % show.venue_id for show in artist_shows})
+
+    # Aggregating data from the Artist, with their respective Shows data.
+    data = {
+        "id": db_artist.id, "name": db_artist.name, "genres": db_artist.genres,
+        "city": db_artist.city, "state": db_artist.state,
+        "phone": db_artist.phone, "seeking_venue": db_artist.seeking_venue,
+        "image_link": db_artist.image_link,
+        "facebook_link": db_artist.facebook_link,
+        "website": db_artist.website_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+    }
+
+    return render_template('pages/show_artist.html', artist=data)
+
+
+#  Update
+#  ----------------------------------------------------------------
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    form = ArtistForm()
+
+    artist = entity_cache.get(Artist, artist_id)
+    if artist is None:
+        abort(404)
+
+    # Populating form with fields from artist with ID <artist_id>
+    form.name.data = artist.name
+    form.city.data = artist.city
+    form.state.data = artist.state
+    form.phone.data = artist.phone
+    form.image_link.data = artist.image_link
+    form.genres.data = list(artist.genres or ())
+    form.facebook_link.data = artist.facebook_link
+    form.website_link.data = artist.website_link
+    form.seeking_venue.data = artist.seeking_venue
+    form.seeking_description.data = artist.seeking_description
+
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    """
+        Takes values from the form submitted, and updates the existing
+        artist record with ID <artist_id> using the form attributes.
+    """
+
+    existing_artist = db.session.query(Artist).filter(
+        Artist.id == artist_id).first()
+
+    error = False
+    form = ArtistForm()
+
+    if form.validate_on_submit():
+        try:
+            # The venues naming it in their summaries are refreshed too,
+            # the same ones that were locked.
+            venue_ids = referencing('artist', artist_id)
+            lock_rows(venue_ids=venue_ids, artist_ids=[artist_id])
+            existing_artist.name = form.name.data
+            existing_artist.city = form.city.data
+            existing_artist.state = form.state.data
+            existing_artist.phone = form.phone.data
+            existing_artist.genres = form.genres.data
+            existing_artist.image_link = form.image_link.data
+            existing_artist.facebook_link = form.facebook_link.data
+            existing_artist.website_link = form.website_link.data
+            existing_artist.seeking_venue = form.seeking_venue.data
+            existing_artist.seeking_description = form.seeking_description.data
+            refresh_summaries('venue', venue_ids)
+
+            db.session.commit()
+            entity_cache.invalidate(Artist, artist_id)
+            # /shows names it too, and streams before knowing its tags.
+            page_cache.invalidate('artist:%d' % artist_id, 'artist-list',
+                                  'venue-list', 'show-list')
+
+            return redirect(url_for('main.show_artist', artist_id=artist_id))
+        except:
+            error = True
+            db.session.rollback()
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+
+        if error:
+            abort(400)
+        else:
+            return redirect(url_for('main.show_artist', artist_id=artist_id))
+    else:
+        return render_template('forms/edit_artist.html', form=form,
+                               artist=existing_artist)
+
+
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    form = VenueForm()
+
+    venue = entity_cache.get(Venue, venue_id)
+    if venue is None:
+        abort(404)
+
+    # Populating form with values from venue with ID <venue_id>
+    form.name.data = venue.name
+    form.city.data = venue.city
+    form.state.data = venue.state
+    form.address.data = venue.address
+    form.phone.data = venue.phone
+    form.image_link.data = venue.image_link
+    form.genres.data = list(venue.genres or ())
+    form.facebook_link.data = venue.facebook_link
+    form.website_link.data = venue.website_link
+    form.seeking_talent.data = venue.seeking_talent
+    form.seeking_description.data = venue.seeking_description
+
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    """
+        Takes values from the form submitted, and update existing
+        venue record with ID <venue_id> using the form attributes.
+    """
+
+    existing_venue = db.session.query(Venue).filter(
+        Venue.id == venue_id).first()
+
+    error = False
+    form = VenueForm()
+
+    if form.validate_on_submit():
+        try:
+            # The artists naming it in their summaries are refreshed too,
+            # the same ones that were locked.
+            artist_ids = referencing('venue', venue_id)
+            lock_rows(venue_ids=[venue_id], artist_ids=artist_ids)
+            existing_venue.name = form.name.data
+            existing_venue.city = form.city.data
+            existing_venue.state = form.state.data
+            existing_venue.address = form.address.data
+            existing_venue.phone = form.phone.data
+            existing_venue.genres = form.genres.data
+            existing_venue.image_link = form.image_link.data
+            existing_venue.facebook_link = form.facebook_link.data
+            existing_venue.website_link = form.website_link.data
+            existing_venue.seeking_talent = form.seeking_talent.data
+            existing_venue.seeking_description = form.seeking_description.data
+            refresh_summaries('artist', artist_ids)
+
+            db.session.commit()
+            entity_cache.invalidate(Venue, venue_id)
+            # /shows names it too, and streams before knowing its tags.
+            page_cache.invalidate('venue:%d' % venue_id, 'venue-list',
+                                  'artist-list', 'show-list')
+
+            return redirect(url_for('main.show_venue', venue_id=venue_id))
+        except:
+            error = True
+            db.session.rollback()
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+
+        if error:
+            abort(400)
+        else:
+            return redirect(url_for('main.show_venue', venue_id=venue_id))
+    else:
+        return render_template('forms/edit_venue.html', form=form,
+                               venue=existing_venue)
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@main.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@main.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    """
+        Called upon submitting the new artist listing form
+        Inserts form data as a new Venue record in the db.
+    """
+
+    error = False
+    form = ArtistForm()
+
+    if form.validate_on_submit():
+        try:
+            name = form.name.data
+            city = form.city.data
+            state = form.state.data
+            phone = form.phone.data
+            genres = form.genres.data
+            image_link = form.image_link.data
+            facebook_link = form.facebook_link.data
+            website_link = form.website_link.data
+            seeking_venue = form.seeking_venue.data
+            seeking_description = form.seeking_description.data
+
+            artist = Artist(name=name, city=city, state=state, phone=phone,
+                            genres=genres, image_link=image_link,
+                            facebook_link=facebook_link,
+                            website_link=website_link,
+                            seeking_venue=seeking_venue,
+                            seeking_description=seeking_description)
+
+            db.session.add(artist)
+            db.session.commit()
+            # Drops a cached miss for the new id.
+            entity_cache.invalidate(Artist, artist.id)
+            page_cache.invalidate('artist-list')
+
+            # On successful db insert, flash success
+            flash('Artist ' + artist.name + ' was successfully listed!')
+        except:
+            error = True
+            db.session.rollback()
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+
+        if error:
+            # On unsuccessful db insert, flash an error instead.
+            flash(
+                'An error occurred. Artist ' + artist.name + ' could not be listed.')
+            abort(400)
+        else:
+
+            return render_template('pages/home.html')
+    else:
+
+        return render_template('forms/new_artist.html', form=form)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@main.route('/shows')
+@page_cache.cached_page('show-list', version=data_version)
+@streamed
+@read_replica
+def shows():
+    """
+        Displays list of shows at /shows
+    """
+
+    try:
+        start_date = parse_date_arg('from')
+        end_date = parse_date_arg('to')
+        config = current_app.config
+        limit = min(request.args.get('limit', config['SHOWS_PER_PAGE'],
+                                     type=int), config['SHOWS_MAX_PER_PAGE'])
+        upcoming_only = request.args.get('upcoming', '') in ('1', 'true')
+        listing = ShowListing(
+            max(limit, 1), after=request.args.get('after'),
+            start_date=start_date, end_date=end_date,
+            upcoming_only=upcoming_only,
+            batch_size=config['STREAM_BATCH_SIZE'], with_names=False)
+    except ValueError:
+        abort(400)
+
+    # Filters carried over to the next page link.
+    filters = {key: value for key, value in request.args.items()
+               if key in ('from', 'to', 'limit', 'upcoming')}
+
+    return render_page('pages/shows.html', shows=show_tiles(listing),
+                       listing=listing, filters=filters)
+
+
+def show_tiles(listing):
+    """
+        Show dictionaries for the listing template, prepared a batch at a
+        time. Venue and artist names come from the entity cache, which reads
+        the ones it misses in one query per batch.
+    """
+    for batch in listing.batches():
+        venue_ids = {show.venue_id for show in batch}
+        artist_ids = {show.artist_id for show in batch}
+        add_cache_tags(*('venue:%d' % venue_id for venue_id in venue_ids),
+                       *('artist:%d' % artist_id for artist_id in artist_ids))
+        venues = entity_cache.get_many(Venue, venue_ids)
+        artists = entity_cache.get_many(Artist, artist_ids)
+
+        tiles = []
+        for show in batch:
+            venue = venues.get(show.venue_id)
+            artist = artists.get(show.artist_id)
+            if venue is None or artist is None:
+                continue
+            tile = show._asdict()
+            tile["venue_name"] = venue.name
+            tile["artist_name"] = artist.name
+            tile["artist_image_link"] = artist.image_link
+            tiles.append(tile)
+        yield from add_start_time_text(tiles)
+
+
+@main.route('/shows/create')
+def create_shows():
+    """
+        For show form rendering.
+    """
+    form = ShowForm()
+
+    return render_template('forms/new_show.html', form=form)
+
+
+@main.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    """
+        Called to create new shows in the db, upon submitting new show listing form.
+        Also inserts form data as a new Show record in the db.
+    """
+
+    error = False
+    form = ShowForm()
+
+    if form.validate_on_submit():
+        try:
+            venue_id = form.venue_id.data
+            artist_id = form.artist_id.data
+            start_time = form.start_time.data
+
+            show = Show(venue_id=venue_id, artist_id=artist_id,
+                        start_time=start_time)
+
+            lock_rows(venue_ids=[venue_id], artist_ids=[artist_id])
+            db.session.add(show)
+            count_show(venue_id, artist_id, start_time)
+            refresh_summaries('venue', [venue_id])
+            refresh_summaries('artist', [artist_id])
+            db.session.commit()
+            page_cache.invalidate('venue:%d' % show.venue_id,
+                                  'artist:%d' % show.artist_id, 'show-list',
+                                  'venue-list', 'artist-list')
+
+            # On successful db insert, flash success
+            flash('Show ' + str(show.id) + ' was successfully listed!')
+        except:
+            error = True
+            db.session.rollback()
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+
+        if error:
+            # On unsuccessful db insert, flash an error instead.
+            flash('An error occurred. Show ' + str(
+                show.id) + ' could not be listed.')
+            abort(400)
+        else:
+
+            return render_template('pages/home.html')
+    else:
+
+        return render_template('forms/new_show.html', form=form)
+
+
+@main.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@main.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask import jsonify
+from jinja2 import FileSystemBytecodeCache
+
+from models import db
+
+
+# ----------------------------------------------------------------------------#
+# Warm-up steps.
+# ----------------------------------------------------------------------------#
+
+def load_assets(app):
+    # Reads the asset manifest, building the assets if there is none. A
+    # shared step: under gunicorn it runs once, in the master, before the
+    # workers fork, rather than in a request.
+    from assets import assets
+    return '%d assets' % len(assets.load(app, build=True))
+
+
+def compile_templates(app):
+    # Compiles every template, writing it to the bytecode cache when one is
+    # configured, and keeps it in the environment's template cache.
+    names = [name for name in app.jinja_env.list_templates()
+             if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return '%d templates' % len(names)
+
+
+def load_locale_data(app):
+    # Loads the Babel 'en' locale data and date patterns used by the
+    # datetime filter.
+    format_datetime = app.jinja_env.filters['datetime']
+    now = datetime.now()
+    for format in ('full', 'medium'):
+        format_datetime(now, format)
+    return 'en'
+
+
+def open_connections(app):
+    # Opens the pool's steady-state connections of every engine, primary and
+    # replicas, and returns them to the pool.
+    opened = 0
+    with app.app_context():
+        for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ()):
+            engine = db.get_engine(app, bind=bind)
+            size = engine.pool.size() if hasattr(engine.pool, 'size') else 1
+            connections = [engine.connect() for _ in range(size)]
+            for connection in connections:
+                connection.close()
+            opened += len(connections)
+    return '%d connections' % opened
+
+
+def render_pages(app):
+    # Renders the hottest pages once, filling the page cache and SQLAlchemy's
+    # statement cache.
+    client = app.test_client()
+    paths = app.config.get('WARMUP_PAGES', ())
+    for path in paths:
+        # Streamed pages only render, and are only cached, as their body is
+        # read.
+        response = client.get(path)
+        response.get_data()
+        response.close()
+    return '%d pages' % len(paths)
+
+
+STEPS = {
+    'assets': load_assets,
+    'templates': compile_templates,
+    'locale': load_locale_data,
+    'pool': open_connections,
+    'pages': render_pages,
+}
+
+# Steps whose results survive a fork, so that a preloading server can run
+# them once in its master process.
+SHARED_STEPS = ('assets', 'templates', 'locale')
+WORKER_STEPS = ('pool', 'pages')
+
+
+# ----------------------------------------------------------------------------#
+# Flask integration.
+# ----------------------------------------------------------------------------#
+
+class Warmup:
+    """
+        Readies a worker before it takes traffic: the asset manifest read,
+        templates compiled into a bytecode cache on disk
+        (JINJA_BYTECODE_CACHE_DIR), Babel locale data
+        loaded, pool connections opened and the WARMUP_PAGES rendered.
+
+        Under gunicorn, gunicorn.conf.py runs the shared steps once in the
+        master and the others in each worker. /ready answers 503 until every
+        step has run, with the state and duration of each one; with
+        WARMUP_ENABLED off it always answers 200.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.steps = {}
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('WARMUP_ENABLED', False)
+        self.steps = {name: {"state": 'pending'} for name in STEPS}
+
+        cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+        app.add_url_rule('/ready', 'ready', self.ready_view)
+
+        @app.cli.command('warmup')
+        @click.option('--step', 'steps', multiple=True,
+                      type=click.Choice(list(STEPS)),
+                      help='Steps to run; assets, templates and locale by '
+                           'default.')
+        def warmup_command(steps):
+            """Load assets, compile templates and load locales."""
+            self.run(app, steps or SHARED_STEPS)
+            for name in steps or SHARED_STEPS:
+                step = self.steps[name]
+                click.echo('%-10s %-7s %8.2f ms  %s' % (
+                    name, step["state"], step.get("ms", 0),
+                    step.get("detail", '')))
+
+    @property
+    def ready(self):
+        if not self.enabled:
+            return True
+        return all(step["state"] == 'done' for step in self.steps.values())
+
+    def run(self, app, steps=tuple(STEPS)):
+        """
+            Runs the named warm-up steps in order. A failing step is logged
+            and recorded; the following steps still run.
+        """
+        with self.lock:
+            for name in steps:
+                step = self.steps[name]
+                step.clear()
+                step["state"] = 'running'
+                started_at = time.perf_counter()
+                try:
+                    step["detail"] = STEPS[name](app)
+                    step["state"] = 'done'
+                except Exception as error:
+                    step["detail"] = str(error)
+                    step["state"] = 'failed'
+                    app.logger.exception('Warm-up step %s failed', name)
+                step["ms"] = round((time.perf_counter() - started_at) * 1000,
+                                   2)
+                app.logger.info('Warm-up step %s %s in %.2f ms: %s', name,
+                                step["state"], step["ms"], step["detail"])
+
+    def ready_view(self):
+        ready = self.ready
+        return jsonify(ready=ready, pid=os.getpid(),
+                       steps=self.steps), 200 if ready else 503
+
+
+warmup = Warmup()